@@ -0,0 +1,53 @@
+"""
+Бенчмарки ya_news.
+
+Запускаются из каталога ya_news как модули, например:
+python -m benchmarks.wordfilter
+"""
+import os
+import statistics
+import time
+from contextlib import contextmanager
+
+
+def setup_django():
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yanews.settings')
+    import django
+    django.setup()
+
+
+@contextmanager
+def test_database():
+    """
+    Временная база с применёнными миграциями, удаляется после.
+
+    Реплика на это время отключена: всё читается из временной базы.
+    """
+    from django.conf import settings
+    from django.db import connection
+    old_name = connection.settings_dict['NAME']
+    replica, settings.NEWS_REPLICA_DB = settings.NEWS_REPLICA_DB, None
+    connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        yield connection
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        settings.NEWS_REPLICA_DB = replica
+
+
+def measure(func, repeat=5, number=1):
+    """Медиана времени одного вызова func в секундах."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        timings.append((time.perf_counter() - start) / number)
+    return statistics.median(timings)
+
+
+def percentile(values, share):
+    """Значение, которого не превышает доля share выборки."""
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(share * len(ordered)) - 1))
+    return ordered[index]
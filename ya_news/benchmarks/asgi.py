@@ -0,0 +1,199 @@
+"""
+Пропускная способность главной и страницы новости ya_news под ASGI.
+
+В том же процессе поднимается минимальный HTTP/1.1-сервер поверх
+asyncio, который передаёт запросы в ASGI-приложение Django. Клиенты
+открывают --connections соединений и шлют по ним запросы подряд
+с keep-alive. Сервер и клиенты делят один цикл событий, поэтому
+абсолютные числа занижены, но прогоны сравнимы между собой.
+
+python -m benchmarks.asgi --connections 500 --requests 20 \
+    --output asgi.json
+"""
+import argparse
+import asyncio
+import json
+import platform
+import sqlite3
+import statistics
+import time
+
+from benchmarks import percentile, setup_django, test_database
+
+HOST = '127.0.0.1'
+
+
+async def call_app(app, scope):
+    """Статус, заголовки и тело ответа ASGI-приложения на GET."""
+    response = {'body': []}
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            response['status'] = message['status']
+            response['headers'] = message.get('headers', [])
+        else:
+            response['body'].append(message.get('body', b''))
+
+    await app(scope, receive, send)
+    return response['status'], response['headers'], b''.join(response['body'])
+
+
+async def read_head(reader):
+    """Стартовая строка и заголовки; None, если соединение закрыто."""
+    line = await reader.readline()
+    if not line:
+        return None
+    headers = []
+    while True:
+        header = await reader.readline()
+        if header in (b'\r\n', b'\n', b''):
+            return line.decode('latin-1').split(), headers
+        name, value = header.decode('latin-1').split(':', 1)
+        headers.append((name.strip().lower().encode(), value.strip().encode()))
+
+
+def serve(app, port):
+    async def handle(reader, writer):
+        while (head := await read_head(reader)) is not None:
+            (method, target, _), headers = head
+            path, _, query = target.partition('?')
+            status, response_headers, body = await call_app(app, {
+                'type': 'http', 'asgi': {'version': '3.0'},
+                'http_version': '1.1', 'method': method, 'scheme': 'http',
+                'path': path, 'raw_path': path.encode(),
+                'query_string': query.encode(), 'root_path': '',
+                'headers': headers, 'client': (HOST, 0),
+                'server': (HOST, port),
+            })
+            lines = [f'HTTP/1.1 {status} -'.encode()]
+            lines += (
+                name + b': ' + value for name, value in response_headers
+                if name.lower() != b'content-length'
+            )
+            lines.append(f'Content-Length: {len(body)}'.encode())
+            writer.write(b'\r\n'.join(lines) + b'\r\n\r\n' + body)
+            await writer.drain()
+        writer.close()
+    return handle
+
+
+async def client(port, path, cookie, requests, timings, errors):
+    """Одно keep-alive соединение, запросы подряд."""
+    reader, writer = await asyncio.open_connection(HOST, port)
+    request = (
+        f'GET {path} HTTP/1.1\r\nHost: localhost\r\n'
+        f'Cookie: {cookie}\r\n\r\n'
+    ).encode()
+    for _ in range(requests):
+        start = time.perf_counter()
+        writer.write(request)
+        (_, status, *_), headers = await read_head(reader)
+        length = int(dict(headers)[b'content-length'])
+        await reader.readexactly(length)
+        timings.append(time.perf_counter() - start)
+        if status != '200':
+            errors.append(status)
+    writer.close()
+
+
+async def run_scenario(app, path, cookie, connections, requests):
+    server = await asyncio.start_server(
+        serve(app, 0), HOST, 0, backlog=connections * 2
+    )
+    port = server.sockets[0].getsockname()[1]
+    timings, errors = [], []
+    async with server:
+        # Прогрев: первый запрос заполняет кеш.
+        await client(port, path, cookie, 1, [], errors)
+        start = time.perf_counter()
+        await asyncio.gather(*(
+            client(port, path, cookie, requests, timings, errors)
+            for _ in range(connections)
+        ))
+        elapsed = time.perf_counter() - start
+    if errors:
+        raise RuntimeError(f'{path}: HTTP {errors[0]}')
+    return {
+        'rps': len(timings) / elapsed,
+        'median_ms': statistics.median(timings) * 1e3,
+        'p95_ms': percentile(timings, 0.95) * 1e3,
+    }
+
+
+def scenarios():
+    """Имя, путь и куки каждого замера."""
+    from django.conf import settings
+    from django.contrib.auth import get_user_model
+    from django.test import Client
+    from django.urls import reverse
+
+    from news.models import Comment, News
+
+    user = get_user_model().objects.create(username='Читатель')
+    news = News.objects.create(title='Новость', text='Текст новости.')
+    Comment.objects.bulk_create(
+        Comment(news=news, author=user, text=f'Комментарий {index}')
+        for index in range(settings.COMMENTS_COUNT_ON_PAGE)
+    )
+    client = Client()
+    client.force_login(user)
+    session = f'{settings.SESSION_COOKIE_NAME}=' + client.cookies[
+        settings.SESSION_COOKIE_NAME
+    ].value
+    detail = reverse('news:detail', args=(news.pk,))
+    return (
+        ('home_anonymous', '/', ''),
+        ('detail_anonymous', detail, ''),
+        ('detail_user', detail, session),
+    )
+
+
+def environment():
+    import django
+
+    return {
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'platform': platform.platform(),
+    }
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--connections', type=int, default=500)
+    parser.add_argument('--requests', type=int, default=20,
+                        help='Запросов по каждому соединению.')
+    parser.add_argument('--output', default='asgi.json')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    setup_django()
+    from django.core.asgi import get_asgi_application
+
+    app = get_asgi_application()
+    results = {}
+    print(f'{"замер":<18} {"запр/с":>9} {"медиана, мс":>12} {"p95, мс":>10}')
+    with test_database():
+        for name, path, cookie in scenarios():
+            result = asyncio.run(run_scenario(
+                app, path, cookie, args.connections, args.requests
+            ))
+            results[name] = result
+            print(f'{name:<18} {result["rps"]:>9.0f} '
+                  f'{result["median_ms"]:>12.2f} {result["p95_ms"]:>10.2f}')
+    with open(args.output, 'w', encoding='utf-8') as file:
+        json.dump({
+            'params': vars(args),
+            'environment': environment(),
+            'results': results,
+        }, file, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,200 @@
+"""
+Параллельные чтение и запись в SQLite: настройки по умолчанию
+против профиля SQLITE_PRAGMAS.
+
+Читатели в потоках открывают главную и страницу комментариев
+новости ORM-запросами, писатели добавляют комментарии. Каждая
+операция — как отдельный HTTP-запрос: после неё вызывается
+close_old_connections, и при CONN_MAX_AGE = 0 соединение закрывается.
+База лежит во временном файле, потому что WAL в памяти не работает.
+
+python -m benchmarks.concurrency --readers 8 --writers 2 --seconds 5 \
+    --output concurrency.json
+"""
+import argparse
+import json
+import platform
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from benchmarks import percentile, setup_django, test_database
+
+# Профиль «как из коробки»: журнал отката, полная синхронизация,
+# таймаут модуля sqlite3 и новое соединение на каждый запрос.
+DEFAULT_PROFILE = {
+    'pragmas': {'journal_mode': 'delete', 'synchronous': 'full',
+                'busy_timeout': 5000},
+    'conn_max_age': 0,
+}
+
+
+def fill(news_count, comments_per_news):
+    from django.contrib.auth import get_user_model
+    from django.db import transaction
+
+    from news.management.commands.recount_comments import recount_comments
+    from news.models import Comment, News
+
+    with transaction.atomic():
+        user = get_user_model().objects.create(username='Писатель')
+        News.objects.bulk_create(
+            News(title=f'Новость {index}', text='Текст новости.')
+            for index in range(news_count)
+        )
+        Comment.objects.bulk_create(
+            Comment(news_id=news_id, author=user, text='Комментарий')
+            for news_id in News.objects.values_list('id', flat=True)
+            for _ in range(comments_per_news)
+        )
+        recount_comments(News.objects.all())
+    return user, list(News.objects.values_list('id', flat=True))
+
+
+def read(news_ids, rng):
+    from django.conf import settings
+
+    from news.models import Comment, News
+
+    list(News.objects.all()[:settings.NEWS_COUNT_ON_HOME_PAGE])
+    list(
+        Comment.objects.filter(news_id=rng.choice(news_ids))
+        .select_related('author')
+        .order_by('-created', '-id')[:settings.COMMENTS_COUNT_ON_PAGE]
+    )
+
+
+def write(news_ids, rng, user):
+    from django.db import transaction
+
+    from news.models import Comment
+
+    with transaction.atomic():
+        Comment.objects.create(
+            news_id=rng.choice(news_ids), author=user, text='Новый'
+        )
+
+
+def worker(operation, deadline, timings, errors, seed):
+    from django.db import OperationalError, close_old_connections, connection
+
+    rng = random.Random(seed)
+    try:
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                operation(rng)
+            except OperationalError as error:
+                errors.append(str(error))
+            else:
+                timings.append(time.perf_counter() - start)
+            close_old_connections()
+    finally:
+        connection.close()
+
+
+def run_profile(profile, args, user, news_ids):
+    """Операции в секунду, задержки и ошибки блокировки для профиля."""
+    from django.conf import settings
+    from django.db import connection
+
+    settings.SQLITE_PRAGMAS = profile['pragmas']
+    connection.settings_dict['CONN_MAX_AGE'] = profile['conn_max_age']
+    # journal_mode меняется только без других соединений с базой.
+    connection.close()
+    connection.ensure_connection()
+    results = {}
+    deadline = time.perf_counter() + args.seconds
+    threads = []
+    for kind, count, operation in (
+        ('read', args.readers, lambda rng: read(news_ids, rng)),
+        ('write', args.writers, lambda rng: write(news_ids, rng, user)),
+    ):
+        results[kind] = {'timings': [], 'errors': []}
+        threads += (
+            threading.Thread(target=worker, args=(
+                operation, deadline, results[kind]['timings'],
+                results[kind]['errors'], f'{kind}{index}',
+            ))
+            for index in range(count)
+        )
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return {
+        kind: {
+            'ops_per_sec': len(result['timings']) / args.seconds,
+            'p95_ms': percentile(result['timings'], 0.95) * 1e3
+            if result['timings'] else None,
+            'errors': len(result['errors']),
+        }
+        for kind, result in results.items()
+    }
+
+
+def environment():
+    import django
+
+    return {
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'platform': platform.platform(),
+    }
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--writers', type=int, default=2)
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--news', type=int, default=200)
+    parser.add_argument('--comments', type=int, default=50,
+                        help='Комментариев к каждой новости.')
+    parser.add_argument('--output', default='concurrency.json')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    setup_django()
+    from django.conf import settings
+    from django.db import connection
+
+    tuned = {
+        'pragmas': settings.SQLITE_PRAGMAS,
+        'conn_max_age': connection.settings_dict['CONN_MAX_AGE'],
+    }
+    results = {}
+    print(f'{"профиль":<8} {"операция":<6} {"оп/с":>8} {"p95, мс":>9} '
+          f'{"ошибок":>7}')
+    with tempfile.TemporaryDirectory() as directory:
+        connection.settings_dict['TEST']['NAME'] = str(
+            Path(directory) / 'concurrency.sqlite3'
+        )
+        settings.SQLITE_PRAGMAS = DEFAULT_PROFILE['pragmas']
+        with test_database():
+            user, news_ids = fill(args.news, args.comments)
+            for name, profile in (('default', DEFAULT_PROFILE),
+                                  ('tuned', tuned)):
+                results[name] = run_profile(profile, args, user, news_ids)
+                for kind, result in results[name].items():
+                    p95 = result['p95_ms']
+                    p95 = '-' if p95 is None else f'{p95:.2f}'
+                    print(f'{name:<8} {kind:<6} '
+                          f'{result["ops_per_sec"]:>8.0f} {p95:>9} '
+                          f'{result["errors"]:>7}')
+    with open(args.output, 'w', encoding='utf-8') as file:
+        json.dump({
+            'params': vars(args),
+            'environment': environment(),
+            'results': results,
+        }, file, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
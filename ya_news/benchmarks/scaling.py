@@ -0,0 +1,230 @@
+"""
+ya_news на больших объёмах данных.
+
+Генерирует N новостей по M комментариев от U пользователей и меряет
+задержку и число SQL-запросов главной, страницы новости, последней
+страницы комментариев и операций с комментарием. Результат пишется
+в JSON, чтобы сравнивать прогоны между собой.
+
+python -m benchmarks.scaling --news 1000 --comments 1000 --users 1000 \
+    --output scaling.json [--compare previous.json]
+"""
+import argparse
+import json
+import platform
+import random
+import sqlite3
+import statistics
+import sys
+import time
+from datetime import timedelta
+
+from benchmarks import percentile, setup_django, test_database
+
+BATCH = 10_000
+WORDS = (
+    'новость', 'город', 'погода', 'выборы', 'спорт', 'рынок', 'театр',
+    'школа', 'дорога', 'парк', 'музей', 'концерт', 'футбол', 'прогноз',
+)
+
+
+def sentence(rng, length):
+    return ' '.join(rng.choices(WORDS, k=length)).capitalize() + '.'
+
+
+def fill(news_count, comments_per_news, users_count, rng):
+    """Наполняет базу пачками bulk_create в одной транзакции."""
+    from django.contrib.auth import get_user_model
+    from django.db import transaction
+    from django.utils import timezone
+
+    from news.management.commands.recount_comments import recount_comments
+    from news.models import Comment, News
+
+    User = get_user_model()
+    today = timezone.localdate()
+    with transaction.atomic():
+        User.objects.bulk_create(
+            (User(username=f'user{index}') for index in range(users_count)),
+            batch_size=BATCH,
+        )
+        user_ids = list(User.objects.values_list('id', flat=True))
+        News.objects.bulk_create((
+            News(
+                title=sentence(rng, 3)[:50],
+                text=sentence(rng, 40),
+                date=today - timedelta(days=index),
+            )
+            for index in range(news_count)
+        ), batch_size=BATCH)
+        batch = []
+        for news_id in News.objects.values_list('id', flat=True).iterator():
+            batch += (
+                Comment(
+                    news_id=news_id,
+                    author_id=rng.choice(user_ids),
+                    text=sentence(rng, 12),
+                )
+                for _ in range(comments_per_news)
+            )
+            if len(batch) >= BATCH:
+                Comment.objects.bulk_create(batch)
+                batch = []
+        Comment.objects.bulk_create(batch)
+        recount_comments(News.objects.all())
+
+
+def run_scenario(func, prepare, repeat):
+    """Задержка и число запросов func; prepare готовит каждый вызов."""
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    timings, queries = [], []
+    for _ in range(repeat):
+        argument = prepare()
+        with CaptureQueriesContext(connection) as context:
+            start = time.perf_counter()
+            response = func(argument)
+            timings.append(time.perf_counter() - start)
+        if response.status_code >= 400:
+            raise RuntimeError(f'HTTP {response.status_code}')
+        queries.append(len(context))
+    return {
+        'median_ms': statistics.median(timings) * 1e3,
+        'p95_ms': percentile(timings, 0.95) * 1e3,
+        'queries': max(queries),
+    }
+
+
+def last_page_cursor(news):
+    """Курсор, после которого остаётся последняя страница комментариев."""
+    from django.conf import settings
+
+    from news.pagination import encode_cursor
+
+    comments = news.comment_set.order_by('-created', '-pk')
+    previous = comments[settings.COMMENTS_COUNT_ON_PAGE:][:1]
+    return encode_cursor(previous[0]) if previous else ''
+
+
+def scenarios(user):
+    """Имя, вызов и подготовка каждого замера."""
+    from django.core.cache import cache
+    from django.test import Client
+    from django.urls import reverse
+
+    from news.models import Comment, News
+
+    anonymous, client = Client(), Client()
+    client.force_login(user)
+    news = News.objects.order_by('pk').first()
+    detail = reverse('news:detail', args=(news.pk,))
+    comments = reverse('news:comments', args=(news.pk,))
+    own = Comment.objects.create(news=news, author=user, text='Свой')
+
+    def new_comment():
+        return Comment.objects.create(news=news, author=user, text='Удалить')
+
+    def nothing():
+        return None
+
+    return (
+        ('home_anonymous_cold', lambda _: anonymous.get('/'), cache.clear),
+        ('home_anonymous_warm', lambda _: anonymous.get('/'), nothing),
+        ('home_user', lambda _: client.get('/'), nothing),
+        ('detail_anonymous_cold', lambda _: anonymous.get(detail),
+         cache.clear),
+        ('detail_anonymous_warm', lambda _: anonymous.get(detail), nothing),
+        ('detail_user', lambda _: client.get(detail), nothing),
+        ('comments_last_page',
+         lambda cursor: anonymous.get(comments, {'after': cursor}),
+         lambda: last_page_cursor(news)),
+        ('comment_post', lambda _: client.post(detail, {'text': 'Новый'}),
+         nothing),
+        ('comment_edit',
+         lambda _: client.post(
+             reverse('news:edit', args=(own.pk,)), {'text': 'Правка'}
+         ),
+         nothing),
+        ('comment_delete',
+         lambda comment: client.post(
+             reverse('news:delete', args=(comment.pk,))
+         ),
+         new_comment),
+    )
+
+
+def environment():
+    import django
+
+    return {
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'platform': platform.platform(),
+    }
+
+
+def compare(results, baseline_path):
+    with open(baseline_path, encoding='utf-8') as file:
+        baseline = json.load(file)['results']
+    print(f'\n{"сравнение":<24} {"было, мс":>10} {"стало, мс":>10} '
+          f'{"раз":>6} {"запросы":>9}')
+    for name, result in results.items():
+        before = baseline.get(name)
+        if not before:
+            continue
+        ratio = before['median_ms'] / result['median_ms']
+        print(f'{name:<24} {before["median_ms"]:>10.2f} '
+              f'{result["median_ms"]:>10.2f} {ratio:>6.2f} '
+              f'{before["queries"]:>4}→{result["queries"]:<4}')
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--news', type=int, default=1_000)
+    parser.add_argument('--comments', type=int, default=100,
+                        help='Комментариев к каждой новости.')
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--repeat', type=int, default=30)
+    parser.add_argument('--output', default='scaling.json')
+    parser.add_argument('--compare', help='JSON прошлого прогона.')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    setup_django()
+    from django.contrib.auth import get_user_model
+    from django.test.utils import setup_test_environment
+
+    setup_test_environment()
+    with test_database():
+        start = time.perf_counter()
+        fill(args.news, args.comments, args.users, random.Random(0))
+        fill_seconds = time.perf_counter() - start
+        print(f'новостей: {args.news}, комментариев: '
+              f'{args.news * args.comments}, пользователей: {args.users}, '
+              f'заполнение: {fill_seconds:.1f} с', file=sys.stderr)
+        user = get_user_model().objects.order_by('pk').first()
+        results = {}
+        print(f'{"замер":<24} {"медиана, мс":>12} {"p95, мс":>10} '
+              f'{"запросов":>9}')
+        for name, func, prepare in scenarios(user):
+            results[name] = run_scenario(func, prepare, args.repeat)
+            print(f'{name:<24} {results[name]["median_ms"]:>12.2f} '
+                  f'{results[name]["p95_ms"]:>10.2f} '
+                  f'{results[name]["queries"]:>9}')
+    with open(args.output, 'w', encoding='utf-8') as file:
+        json.dump({
+            'params': vars(args),
+            'environment': environment(),
+            'fill_seconds': fill_seconds,
+            'results': results,
+        }, file, ensure_ascii=False, indent=2)
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+"""
+Сравнение фильтра запрещённых слов с прежним перебором.
+
+python -m benchmarks.wordfilter
+"""
+import random
+
+from benchmarks import measure
+from news.wordfilter import WordFilter
+
+ALPHABET = 'абвгдежзийклмнопрстуфхцчшщыэюя'
+SIZES = (10, 1_000, 50_000)
+COMMENT = (
+    'Отличная новость, спасибо автору! Читал с удовольствием, '
+    'жду продолжения и подробностей о том, что будет дальше. '
+) * 4
+
+
+def random_words(count, seed=0):
+    rng = random.Random(seed)
+    return [
+        ''.join(rng.choices(ALPHABET, k=rng.randint(5, 12)))
+        for _ in range(count)
+    ]
+
+
+def loop_filter(words, text):
+    """Прежняя проверка из CommentForm.clean_text."""
+    lowered_text = text.lower()
+    for word in words:
+        if word in lowered_text:
+            return word
+    return None
+
+
+def main():
+    print(f'{"слов":>8} {"перебор, мкс":>14} {"фильтр, мкс":>14} '
+          f'{"сборка, мс":>12}')
+    for size in SIZES:
+        words = random_words(size)
+        build = measure(lambda: WordFilter(words), repeat=3)
+        word_filter = WordFilter(words)
+        loop = measure(lambda: loop_filter(words, COMMENT), number=10)
+        compiled = measure(lambda: word_filter.search(COMMENT), number=10)
+        print(f'{size:>8} {loop * 1e6:>14.1f} {compiled * 1e6:>14.1f} '
+              f'{build * 1e3:>12.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,11 +1,13 @@
 from django.contrib import admin
 
-from .models import Comment, News
+from .models import BannedWord, Comment, News
 
 
 class CommentInline(admin.StackedInline):
     model = Comment
     extra = 0
+    # Статус меняет модерация: change_status обновляет счётчик и индекс.
+    readonly_fields = ('status',)
 
 
 @admin.register(News)
@@ -13,3 +15,9 @@ class NewsAdmin(admin.ModelAdmin):
     inlines = [
         CommentInline,
     ]
+    list_display = ('title', 'date', 'comment_count')
+
+
+@admin.register(BannedWord)
+class BannedWordAdmin(admin.ModelAdmin):
+    search_fields = ('word',)
@@ -5,3 +5,19 @@ class NewsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'news'
     verbose_name = 'Новости'
+
+    def ready(self):
+        from django.contrib.auth import get_user_model
+        from django.db.backends.signals import connection_created
+        from django.db.models.signals import post_delete, post_save
+
+        from . import signals  # noqa: F401
+        from .auth import forget_user
+        from .querybudget import install_counter
+        from .search import connect_fts_table
+        from .sqlite import configure_connection
+        connection_created.connect(configure_connection)
+        connection_created.connect(connect_fts_table)
+        connection_created.connect(install_counter)
+        post_save.connect(forget_user, sender=get_user_model())
+        post_delete.connect(forget_user, sender=get_user_model())
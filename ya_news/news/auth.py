@@ -0,0 +1,62 @@
+"""
+Пользователь для AuthenticationMiddleware из кеша.
+
+ModelBackend на каждый запрос читает пользователя из базы. Здесь он
+кешируется по id на USER_CACHE_TIMEOUT и удаляется из кеша сигналами
+при сохранении, в том числе при смене пароля, и при удалении. Вместе
+с SESSION_ENGINE cached_db авторизованный запрос не ходит в базу ни
+за сессией, ни за пользователем. Изменения через QuerySet.update
+сигналов не шлют и видны только после таймаута.
+"""
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+
+USER_KEY = 'auth:user:{user_id}'
+# Бэкенд, записанный в сессиях до CachedModelBackend, и его замена.
+MODEL_BACKEND = 'django.contrib.auth.backends.ModelBackend'
+CACHED_BACKEND = 'news.auth.CachedModelBackend'
+
+
+def user_key(user_id):
+    return USER_KEY.format(user_id=user_id)
+
+
+def forget_user(sender, instance, **kwargs):
+    """Приёмник post_save и post_delete, подключается в NewsConfig.ready."""
+    cache.delete(user_key(instance.pk))
+
+
+class CachedModelBackend(ModelBackend):
+    """ModelBackend, который берёт пользователя сессии из кеша."""
+
+    def get_user(self, user_id):
+        key = user_key(user_id)
+        user = cache.get(key)
+        if user is None:
+            try:
+                user = get_user_model()._default_manager.get(pk=user_id)
+            except get_user_model().DoesNotExist:
+                return None
+            cache.set(key, user, settings.USER_CACHE_TIMEOUT)
+        return user if self.user_can_authenticate(user) else None
+
+
+class SessionBackendMiddleware:
+    """
+    Переводит сессии, созданные до CachedModelBackend, на него.
+
+    В таких сессиях записан путь ModelBackend, которого нет
+    в AUTHENTICATION_BACKENDS, и пользователя иначе разлогинило бы.
+    Сессия переписывается один раз, на первом запросе. Должна стоять
+    между SessionMiddleware и AuthenticationMiddleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if request.session.get(BACKEND_SESSION_KEY) == MODEL_BACKEND:
+            request.session[BACKEND_SESSION_KEY] = CACHED_BACKEND
+        return self.get_response(request)
@@ -0,0 +1,122 @@
+"""
+Кеш отрендеренных фрагментов новостей.
+
+Ключ фрагмента содержит версию новости. Любая запись, которая меняет
+новость или её комментарии, увеличивает версию, и старые фрагменты
+просто перестают читаться, а затем вытесняются по таймауту.
+
+Для главной страницы так же версионируются целая страница для анонимов
+и фрагмент со списком новостей для авторизованных пользователей.
+"""
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .replica import read_from_replica
+
+BANNED_WORDS_VERSION_KEY = 'news:banned_words:version'
+HOME_VERSION_KEY = 'news:home:version'
+HOME_PAGE_KEY = 'news:home:v{version}:page'
+HOME_LIST_KEY = 'news:home:v{version}:list'
+STORY_VERSION_KEY = 'news:{news_id}:version'
+STORY_KEY = 'news:{news_id}:v{version}:story'
+COMMENTS_KEY = 'news:{news_id}:v{version}:comments:{cursor}'
+
+
+def _initial_version():
+    # Версия от времени не совпадёт с версией вытесненного ключа,
+    # поэтому старые фрагменты не оживут после потери счётчика.
+    return int(time.time() * 1000)
+
+
+# Попадания и промахи по видам кеша в текущем процессе,
+# отдаются в /metrics/ как news_cache_lookups_total.
+stats = Counter()
+_stats_lock = threading.Lock()
+
+
+def record_lookup(name, hit):
+    with _stats_lock:
+        stats[name, 'hit' if hit else 'miss'] += 1
+
+
+def lookup_stats():
+    """Снимок счётчиков: (вид фрагмента, hit или miss) → число."""
+    with _stats_lock:
+        return dict(stats)
+
+
+def _get_version(key):
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _initial_version(), None)
+        version = cache.get(key)
+    return version
+
+
+def _bump_version(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, _initial_version(), None)
+
+
+def get_story_version(news_id):
+    return _get_version(STORY_VERSION_KEY.format(news_id=news_id))
+
+
+def bump_story_version(news_id):
+    """Делает недействительными все фрагменты новости."""
+    _bump_version(STORY_VERSION_KEY.format(news_id=news_id))
+
+
+def get_home_version():
+    return _get_version(HOME_VERSION_KEY)
+
+
+def bump_home_version():
+    """Делает недействительной главную страницу."""
+    _bump_version(HOME_VERSION_KEY)
+
+
+def get_banned_words_version():
+    return _get_version(BANNED_WORDS_VERSION_KEY)
+
+
+def bump_banned_words_version():
+    """Заставляет процессы пересобрать фильтр запрещённых слов."""
+    _bump_version(BANNED_WORDS_VERSION_KEY)
+
+
+def home_page_key(version):
+    return HOME_PAGE_KEY.format(version=version)
+
+
+def home_list_key(version):
+    return HOME_LIST_KEY.format(version=version)
+
+
+def story_key(news_id, version):
+    return STORY_KEY.format(news_id=news_id, version=version)
+
+
+def comments_key(news_id, version, cursor=None):
+    return COMMENTS_KEY.format(
+        news_id=news_id, version=version, cursor=cursor or ''
+    )
+
+
+def cache_set(key, value):
+    """
+    Кладёт фрагмент в кеш.
+
+    Прочитанное с реплики может отставать от версии в ключе, поэтому
+    живёт только NEWS_REPLICA_LAG секунд, пока реплика догоняет.
+    """
+    timeout = settings.NEWS_CACHE_TIMEOUT
+    if read_from_replica():
+        timeout = settings.NEWS_REPLICA_LAG
+    cache.set(key, value, timeout)
@@ -1,7 +1,10 @@
 from django.forms import ModelForm
 from django.core.exceptions import ValidationError
 
-from .models import Comment
+from .cache import get_banned_words_version
+from .models import BannedWord, Comment
+from .timing import TimedFormMixin
+from .wordfilter import WordFilterCache
 
 BAD_WORDS = (
     'редиска',
@@ -11,7 +14,20 @@ BAD_WORDS = (
 WARNING = 'Не ругайтесь!'
 
 
-class CommentForm(ModelForm):
+def load_bad_words():
+    """Слова из BAD_WORDS и таблицы запрещённых слов."""
+    return [
+        *BAD_WORDS,
+        *BannedWord.objects.values_list('word', flat=True),
+    ]
+
+
+# Таблица читается только при смене версии списка в кеше,
+# обычная проверка комментария в базу не ходит.
+bad_words_filter = WordFilterCache(load_bad_words, get_banned_words_version)
+
+
+class CommentForm(TimedFormMixin, ModelForm):
 
     class Meta:
         model = Comment
@@ -20,8 +36,6 @@ class CommentForm(ModelForm):
     def clean_text(self):
         """Не позволяем ругаться в комментариях."""
         text = self.cleaned_data['text']
-        lowered_text = text.lower()
-        for word in BAD_WORDS:
-            if word in lowered_text:
-                raise ValidationError(WARNING)
+        if bad_words_filter.get().search(text):
+            raise ValidationError(WARNING)
         return text
@@ -0,0 +1,223 @@
+import json
+import re
+import time
+from contextlib import contextmanager
+from functools import lru_cache
+from itertools import groupby
+from pathlib import Path
+
+from django.apps import apps
+from django.core import serializers
+from django.core.management.base import BaseCommand, CommandError
+from django.core.serializers.base import DeserializationError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from news.cache import bump_home_version, bump_story_version
+from news.management.commands.recount_comments import recount_comments
+from news.models import Comment, News
+
+CHUNK_SIZE = 64 * 1024
+JSON_LINES_SUFFIXES = ('.jsonl', '.ndjson')
+WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+
+def iter_json_array(file):
+    """
+    Объекты массива JSON по одному, без чтения файла целиком.
+
+    Файл читается кусками по CHUNK_SIZE; в памяти держится только
+    недоразобранный хвост буфера.
+    """
+    decoder = json.JSONDecoder()
+    buffer, pos, started = '', 0, False
+    while True:
+        pos = WHITESPACE.match(buffer, pos).end()
+        if pos < len(buffer):
+            char = buffer[pos]
+            if not started:
+                if char != '[':
+                    raise CommandError('Фикстура должна быть массивом JSON.')
+                started = True
+                pos += 1
+                continue
+            if char == ']':
+                return
+            if char == ',':
+                pos += 1
+                continue
+            try:
+                item, pos = decoder.raw_decode(buffer, pos)
+            except ValueError:
+                pass
+            else:
+                yield item
+                continue
+        chunk = file.read(CHUNK_SIZE)
+        if not chunk:
+            raise CommandError('Некорректный или оборванный JSON.')
+        buffer, pos = buffer[pos:] + chunk, 0
+
+
+def iter_json_lines(file):
+    for number, line in enumerate(file, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError as error:
+            raise CommandError(f'Строка {number}: {error}')
+
+
+@lru_cache(maxsize=None)
+def timestamp_fields(model):
+    return tuple(
+        field for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now', False)
+        or getattr(field, 'auto_now_add', False)
+    )
+
+
+def iter_objects(items):
+    """
+    Несохранённые объекты моделей из записей фикстуры.
+
+    Пустые auto_now-поля заполняются здесь же: при загрузке они
+    отключены, см. fixture_timestamps.
+    """
+    now = timezone.now()
+    for item in items:
+        try:
+            deserialized = list(serializers.deserialize('python', [item]))
+        except DeserializationError as error:
+            raise CommandError(str(error))
+        for obj in (entry.object for entry in deserialized):
+            for field in timestamp_fields(type(obj)):
+                if getattr(obj, field.attname) is None:
+                    setattr(obj, field.attname, now)
+            yield obj
+
+
+@contextmanager
+def fixture_timestamps(models):
+    """
+    Сохраняет даты из фикстуры, как loaddata.
+
+    bulk_create, в отличие от loaddata, заменяет значения
+    auto_now и auto_now_add текущим временем.
+    """
+    fields = [field for model in models for field in timestamp_fields(model)]
+    flags = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in flags:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+@contextmanager
+def sqlite_sync_off(enabled):
+    """Временно отключает PRAGMA synchronous на SQLite."""
+    if not enabled or connection.vendor != 'sqlite':
+        yield
+        return
+    if connection.in_atomic_block:
+        raise CommandError('PRAGMA synchronous нельзя менять в транзакции.')
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA synchronous')
+        previous = cursor.fetchone()[0]
+        cursor.execute('PRAGMA synchronous = OFF')
+    try:
+        yield
+    finally:
+        with connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA synchronous = {int(previous)}')
+
+
+class Command(BaseCommand):
+    help = (
+        'Потоково загружает новости и комментарии из фикстуры '
+        'JSON или JSON Lines пачками через bulk_create.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='+', help='Файлы фикстур.')
+        parser.add_argument(
+            '--format', choices=('json', 'jsonl'),
+            help='Формат файлов; по умолчанию по расширению.',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Объектов в одной транзакции.',
+        )
+        parser.add_argument(
+            '--no-sync', action='store_true',
+            help='На SQLite отключить synchronous на время загрузки: '
+                 'быстрее, но сбой питания может испортить базу.',
+        )
+
+    def handle(self, *args, **options):
+        self.verbosity = options['verbosity']
+        self.news_ids = set()
+        started = time.perf_counter()
+        with sqlite_sync_off(options['no_sync']), fixture_timestamps(
+            apps.get_app_config('news').get_models()
+        ):
+            loaded = sum(
+                self.load_file(Path(path), options)
+                for path in options['paths']
+            )
+        if loaded:
+            # bulk_create не шлёт сигналов: счётчики и кеш обновляются
+            # здесь, поисковый индекс — командой rebuild_search_index.
+            recount_comments(News.objects.all())
+            bump_home_version()
+            for news_id in self.news_ids:
+                bump_story_version(news_id)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f'Загружено объектов: {loaded} за {elapsed:.1f} с, '
+            f'{loaded / elapsed:.0f} строк/с'
+        )
+
+    def load_file(self, path, options):
+        file_format = options['format'] or (
+            'jsonl' if path.suffix in JSON_LINES_SUFFIXES else 'json'
+        )
+        read = iter_json_lines if file_format == 'jsonl' else iter_json_array
+        loaded, started = 0, time.perf_counter()
+        with open(path, encoding='utf-8') as file:
+            batch = []
+            for obj in iter_objects(read(file)):
+                batch.append(obj)
+                if len(batch) >= options['batch_size']:
+                    loaded += self.save_batch(batch)
+                    batch = []
+                    self.report(path, loaded, started)
+            loaded += self.save_batch(batch)
+        self.report(path, loaded, started)
+        return loaded
+
+    def save_batch(self, batch):
+        """Пачка сохраняется в одной транзакции, по bulk_create на модель."""
+        with transaction.atomic():
+            for model, objects in groupby(batch, key=type):
+                model.objects.bulk_create(objects)
+        # Новости, чьи фрагменты в кеше устарели после загрузки.
+        self.news_ids.update(
+            obj.news_id if isinstance(obj, Comment) else obj.pk
+            for obj in batch if isinstance(obj, (Comment, News))
+        )
+        self.news_ids.discard(None)
+        return len(batch)
+
+    def report(self, path, loaded, started):
+        if self.verbosity < 2:
+            return
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f'{path.name}: {loaded} объектов, '
+            f'{loaded / elapsed:.0f} строк/с'
+        )
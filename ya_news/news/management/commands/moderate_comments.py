@@ -0,0 +1,58 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from news.moderation import process_batch
+
+
+class Command(BaseCommand):
+    help = 'Модерирует комментарии из очереди пулом обработчиков.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=4,
+            help='Число параллельных обработчиков.',
+        )
+        parser.add_argument(
+            '--batch', type=int, default=50,
+            help='Сколько задач обработчик забирает за раз.',
+        )
+        parser.add_argument(
+            '--sleep', type=float, default=1.0,
+            help='Пауза в секундах, когда очередь пуста.',
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Разобрать очередь и завершиться.',
+        )
+
+    def handle(self, *args, **options):
+        self.stop = threading.Event()
+        with ThreadPoolExecutor(options['workers']) as pool:
+            workers = [
+                pool.submit(self.work, options)
+                for _ in range(options['workers'])
+            ]
+            try:
+                processed = sum(worker.result() for worker in workers)
+            except KeyboardInterrupt:
+                self.stop.set()
+                processed = sum(worker.result() for worker in workers)
+        self.stdout.write(f'Обработано комментариев: {processed}')
+
+    def work(self, options):
+        processed = 0
+        try:
+            while not self.stop.is_set():
+                count = process_batch(options['batch'])
+                processed += count
+                if not count:
+                    if options['once']:
+                        break
+                    self.stop.wait(options['sleep'])
+        finally:
+            # У каждого потока своё соединение с базой.
+            connection.close()
+        return processed
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from news.search import fts_available, rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'Заново строит поисковый индекс новостей и комментариев.'
+
+    def handle(self, *args, **options):
+        news_count, comment_count = rebuild_index()
+        backend = 'FTS5' if fts_available() else 'запасной индекс'
+        self.stdout.write(
+            f'Проиндексировано ({backend}): новостей {news_count}, '
+            f'комментариев {comment_count}'
+        )
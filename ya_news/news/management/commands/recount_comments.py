@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from news.cache import bump_home_version
+from news.models import Comment, News
+
+
+def recount_comments(news_queryset):
+    """Пересчитывает comment_count одним UPDATE по всем новостям."""
+    counts = Comment.objects.filter(
+        news=OuterRef('pk'), status=Comment.Status.APPROVED
+    ).order_by().values('news').annotate(total=Count('pk')).values('total')
+    return news_queryset.update(
+        comment_count=Coalesce(Subquery(counts), 0)
+    )
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает денормализованный счётчик комментариев новостей.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'news_ids', nargs='*', type=int,
+            help='Идентификаторы новостей; по умолчанию все новости.',
+        )
+
+    def handle(self, *args, **options):
+        news = News.objects.all()
+        if options['news_ids']:
+            news = news.filter(pk__in=options['news_ids'])
+        updated = recount_comments(news)
+        bump_home_version()
+        self.stdout.write(f'Обновлено новостей: {updated}')
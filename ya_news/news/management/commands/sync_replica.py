@@ -0,0 +1,27 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+def sync_replica(replica_alias):
+    """Копирует основную базу SQLite в реплику через backup API."""
+    primary = connections[DEFAULT_DB_ALIAS]
+    replica = connections[replica_alias]
+    if primary.vendor != 'sqlite' or replica.vendor != 'sqlite':
+        raise CommandError('Копировать можно только базу SQLite.')
+    primary.ensure_connection()
+    replica.ensure_connection()
+    primary.connection.backup(replica.connection)
+
+
+class Command(BaseCommand):
+    help = (
+        'Копирует основную базу в реплику, как это сделала бы '
+        'репликация; нужна, чтобы проверить реплику локально.'
+    )
+
+    def handle(self, *args, **options):
+        if not settings.NEWS_REPLICA_DB:
+            raise CommandError('Реплика отключена: NEWS_REPLICA_DB пуст.')
+        sync_replica(settings.NEWS_REPLICA_DB)
+        self.stdout.write(f'Реплика {settings.NEWS_REPLICA_DB} обновлена.')
@@ -0,0 +1,35 @@
+# Generated by Django 3.2.15 on 2026-10-18 19:04
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0003_bannedword'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='status',
+            field=models.CharField(choices=[('pending', 'На модерации'), ('approved', 'Опубликован'), ('rejected', 'Отклонён')], default='approved', max_length=10, verbose_name='Статус'),
+        ),
+        migrations.CreateModel(
+            name='ModerationTask',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('locked_until', models.DateTimeField(blank=True, null=True)),
+                ('token', models.CharField(blank=True, max_length=32)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('comment', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='moderation_task', to='news.comment')),
+            ],
+            options={
+                'verbose_name': 'Задача модерации',
+                'verbose_name_plural': 'Задачи модерации',
+                'ordering': ('created',),
+            },
+        ),
+    ]
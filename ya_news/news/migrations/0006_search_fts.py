@@ -0,0 +1,57 @@
+# Generated by Django 3.2.15 on 2026-10-18 19:15
+
+from django.db import migrations
+
+# В таблицу попадают уже выделенные основы слов, поэтому триггеров нет:
+# индекс обновляет news.search при сохранении новостей и комментариев.
+# Строки новостей лежат под rowid = -id, комментариев под rowid = id.
+# Ранг по умолчанию — bm25, где заголовок весит как news.search.TITLE_WEIGHT.
+CREATE_FTS = (
+    """
+    CREATE VIRTUAL TABLE news_search_fts USING fts5(
+        news_id UNINDEXED, title, text,
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    INSERT INTO news_search_fts(news_search_fts, rank)
+    VALUES ('rank', 'bm25(0.0, 3.0, 1.0)')
+    """,
+)
+DROP_FTS = 'DROP TABLE IF EXISTS news_search_fts'
+
+
+def fts5_available(schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return False
+    with schema_editor.connection.cursor() as cursor:
+        try:
+            cursor.execute(
+                'CREATE VIRTUAL TABLE temp.fts5_probe USING fts5(text)'
+            )
+        except Exception:
+            return False
+        cursor.execute('DROP TABLE temp.fts5_probe')
+    return True
+
+
+def create_fts(apps, schema_editor):
+    if fts5_available(schema_editor):
+        for sql in CREATE_FTS:
+            schema_editor.execute(sql)
+
+
+def drop_fts(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(DROP_FTS)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0005_searchentry'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fts, drop_fts),
+    ]
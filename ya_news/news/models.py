@@ -8,9 +8,19 @@ class News(models.Model):
     title = models.CharField(max_length=50)
     text = models.TextField()
     date = models.DateField(default=datetime.today)
+    comment_count = models.PositiveIntegerField(
+        'Количество комментариев',
+        default=0,
+        editable=False,
+    )
 
     class Meta:
-        ordering = ('-date',)
+        # id разводит новости одного дня и совпадает с индексом,
+        # поэтому главная читает первые строки индекса без сортировки.
+        ordering = ('-date', '-id')
+        indexes = (
+            models.Index(fields=('-date', '-id'), name='news_date_id_idx'),
+        )
         verbose_name_plural = 'Новости'
         verbose_name = 'Новость'
 
@@ -19,19 +29,103 @@ class News(models.Model):
 
 
 class Comment(models.Model):
+
+    class Status(models.TextChoices):
+        PENDING = 'pending', 'На модерации'
+        APPROVED = 'approved', 'Опубликован'
+        REJECTED = 'rejected', 'Отклонён'
+
+    # Отдельные индексы внешних ключей не нужны: их заменяют
+    # составные индексы из Meta, которые начинаются с тех же полей.
     news = models.ForeignKey(
         News,
-        on_delete=models.CASCADE
+        on_delete=models.CASCADE,
+        db_index=False,
     )
     author = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
+        db_index=False,
     )
     text = models.TextField()
     created = models.DateTimeField(auto_now_add=True)
+    status = models.CharField(
+        'Статус',
+        max_length=10,
+        choices=Status.choices,
+        default=Status.APPROVED,
+    )
 
     class Meta:
         ordering = ('created',)
+        indexes = (
+            models.Index(
+                fields=('news', 'created', 'id'),
+                name='comment_news_created_idx',
+            ),
+            models.Index(
+                fields=('author', 'id'), name='comment_author_id_idx'
+            ),
+        )
 
     def __str__(self):
         return self.text[:50]
+
+
+class ModerationTask(models.Model):
+    """Очередь комментариев, ожидающих фоновой модерации."""
+    comment = models.OneToOneField(
+        Comment,
+        on_delete=models.CASCADE,
+        related_name='moderation_task',
+    )
+    created = models.DateTimeField(auto_now_add=True)
+    locked_until = models.DateTimeField(null=True, blank=True)
+    token = models.CharField(max_length=32, blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+
+    class Meta:
+        ordering = ('created',)
+        verbose_name_plural = 'Задачи модерации'
+        verbose_name = 'Задача модерации'
+
+    def __str__(self):
+        return f'Модерация комментария {self.comment_id}'
+
+
+class BannedWord(models.Model):
+    word = models.CharField('Слово', max_length=100, unique=True)
+
+    class Meta:
+        ordering = ('word',)
+        verbose_name_plural = 'Запрещённые слова'
+        verbose_name = 'Запрещённое слово'
+
+    def __str__(self):
+        return self.word
+
+
+class SearchEntry(models.Model):
+    """
+    Запасной инвертированный индекс поиска: основа слова и новость.
+
+    Нужен, когда в SQLite нет FTS5. Слова комментариев ведут
+    к их новости; comment_id пуст у слов заголовка и текста новости.
+    """
+    term = models.CharField(max_length=100)
+    news = models.ForeignKey(News, on_delete=models.CASCADE)
+    comment_id = models.PositiveBigIntegerField(null=True, blank=True)
+    weight = models.PositiveSmallIntegerField(default=1)
+
+    class Meta:
+        indexes = (
+            models.Index(
+                fields=('term', 'news'), name='news_search_term_idx'
+            ),
+            models.Index(
+                fields=('comment_id',), name='news_search_comment_idx'
+            ),
+        )
+
+    def __str__(self):
+        return self.term
@@ -0,0 +1,181 @@
+"""
+Фоновая модерация комментариев.
+
+Новый или отредактированный комментарий сохраняется со статусом
+«на модерации» и задачей в таблице ModerationTask. Обработчики из
+команды moderate_comments забирают задачи пачками, прогоняют проверки
+и публикуют или отклоняют комментарии.
+"""
+import logging
+import re
+import uuid
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .cache import bump_home_version, bump_story_version
+from .models import Comment, ModerationTask, News
+from .search import index_comment, unindex_comment
+
+logger = logging.getLogger(__name__)
+
+LEASE = timedelta(minutes=5)
+RETRY_DELAY = timedelta(minutes=1)
+MAX_LINKS = 2
+DUPLICATE_WINDOW = timedelta(hours=1)
+SPAM_SCORE_LIMIT = 3
+LINK_RE = re.compile(r'https?://|www\.', re.IGNORECASE)
+REPEATED_CHAR_RE = re.compile(r'(.)\1{5,}')
+
+
+def check_links(comment):
+    if len(LINK_RE.findall(comment.text)) > MAX_LINKS:
+        return 'Слишком много ссылок.'
+
+
+def check_spam_score(comment):
+    """Набирает баллы за типичные признаки спама."""
+    text = comment.text
+    letters = [char for char in text if char.isalpha()]
+    score = 0
+    if len(letters) >= 10 and sum(map(str.isupper, letters)) > (
+            0.7 * len(letters)):
+        score += 2
+    if REPEATED_CHAR_RE.search(text):
+        score += 1
+    if LINK_RE.search(text):
+        score += 1
+    if text.count('!') > 5:
+        score += 1
+    if score >= SPAM_SCORE_LIMIT:
+        return 'Похоже на спам.'
+
+
+def check_duplicate(comment):
+    if Comment.objects.filter(
+        author_id=comment.author_id,
+        text=comment.text,
+        created__gte=comment.created - DUPLICATE_WINDOW,
+        pk__lt=comment.pk,
+    ).exists():
+        return 'Такой комментарий уже был.'
+
+
+CHECKS = (check_links, check_spam_score, check_duplicate)
+
+
+def enqueue(comment, is_new=False):
+    """
+    Отправляет комментарий на модерацию.
+
+    У нового комментария задачи ещё нет, и её можно создать
+    одним INSERT; у отредактированного сначала сбрасывается старая.
+    """
+    if not is_new and ModerationTask.objects.filter(comment=comment).update(
+        locked_until=None, token='', attempts=0
+    ):
+        return
+    ModerationTask.objects.create(comment=comment)
+
+
+def add_comment_count(news_id, delta):
+    news = News.objects.filter(pk=news_id)
+    if delta < 0:
+        # Условие на счётчик не даёт уйти в минус при рассинхроне.
+        news = news.filter(comment_count__gt=0)
+    news.update(comment_count=F('comment_count') + delta)
+
+
+def change_status(comment, status):
+    """
+    Меняет статус комментария и счётчик опубликованных у новости.
+
+    Обновление условно по старому статусу, поэтому при гонке
+    счётчик меняет только тот, кто действительно сменил статус.
+    """
+    approved = Comment.Status.APPROVED
+    delta = (status == approved) - (comment.status == approved)
+    with transaction.atomic(savepoint=False):
+        changed = Comment.objects.filter(
+            pk=comment.pk, status=comment.status
+        ).update(status=status)
+        if changed and delta:
+            add_comment_count(comment.news_id, delta)
+            if delta > 0:
+                index_comment(comment)
+            else:
+                unindex_comment(comment.pk)
+    if changed:
+        comment.status = status
+        bump_story_version(comment.news_id)
+        if delta:
+            bump_home_version()
+    return bool(changed)
+
+
+def moderate(comment):
+    """Возвращает причину отклонения или None."""
+    for check in CHECKS:
+        reason = check(comment)
+        if reason:
+            return reason
+    return None
+
+
+def claim_tasks(limit):
+    """Атомарно забирает до limit свободных задач этим обработчиком."""
+    now = timezone.now()
+    available = Q(locked_until__isnull=True) | Q(locked_until__lte=now)
+    token = uuid.uuid4().hex
+    ids = ModerationTask.objects.filter(available).values('pk')[:limit]
+    # Условие повторяется снаружи, чтобы строку, которую успел забрать
+    # другой обработчик, база отбросила при перепроверке.
+    ModerationTask.objects.filter(available, pk__in=ids).update(
+        token=token, locked_until=now + LEASE
+    )
+    return list(
+        ModerationTask.objects.filter(token=token).select_related('comment')
+    )
+
+
+def process_task(task):
+    """
+    Модерирует комментарий задачи, если она всё ещё за этим обработчиком.
+
+    Правка комментария сбрасывает token задачи; тогда задача остаётся
+    в очереди для следующего прохода, а текст из памяти не проверяется.
+    Комментарий перечитывается в той же транзакции, что и удаление
+    задачи, поэтому проверяется и публикуется один и тот же текст.
+    """
+    with transaction.atomic():
+        deleted, _ = ModerationTask.objects.filter(
+            pk=task.pk, token=task.token
+        ).delete()
+        if not deleted:
+            return
+        comment = Comment.objects.select_for_update().get(pk=task.comment_id)
+        reason = moderate(comment)
+        status = (
+            Comment.Status.REJECTED if reason else Comment.Status.APPROVED
+        )
+        change_status(comment, status)
+    if reason:
+        logger.info('Комментарий %s отклонён: %s', comment.pk, reason)
+
+
+def process_batch(limit=50):
+    """Обрабатывает одну пачку задач и возвращает их число."""
+    tasks = claim_tasks(limit)
+    for task in tasks:
+        try:
+            process_task(task)
+        except Exception:
+            logger.exception('Ошибка модерации комментария %s',
+                             task.comment_id)
+            ModerationTask.objects.filter(pk=task.pk).update(
+                attempts=F('attempts') + 1,
+                locked_until=timezone.now() + RETRY_DELAY,
+            )
+    return len(tasks)
@@ -0,0 +1,54 @@
+"""Keyset-пагинация комментариев по паре (created, id)."""
+from datetime import datetime, timedelta, timezone
+
+from django.conf import settings
+from django.db.models import Q
+from django.http import Http404
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+MICROSECOND = timedelta(microseconds=1)
+CURSOR_SEPARATOR = '.'
+
+
+def encode_cursor(comment):
+    """Курсор на комментарий: микросекунды с начала эпохи и id."""
+    micros = (comment.created - EPOCH) // MICROSECOND
+    return f'{micros}{CURSOR_SEPARATOR}{comment.pk}'
+
+
+def decode_cursor(cursor):
+    """Возвращает пару (created, id) или 404 для испорченного курсора."""
+    try:
+        micros, pk = cursor.split(CURSOR_SEPARATOR)
+        return EPOCH + int(micros) * MICROSECOND, int(pk)
+    except (ValueError, OverflowError):
+        raise Http404('Некорректный курсор комментариев.')
+
+
+def comments_after(comments, cursor=None):
+    """
+    Комментарии по порядку (created, id), начиная после курсора.
+
+    Условие на (created, id) вместо OFFSET позволяет базе сразу перейти
+    к нужному месту индекса (news, created, id), поэтому любая страница
+    стоит как первая. Отдельное created >= курсора нужно SQLite, чтобы
+    начать поиск по индексу с курсора: условие с OR она так не разбирает.
+    """
+    comments = comments.order_by('created', 'pk')
+    if cursor:
+        created, pk = decode_cursor(cursor)
+        comments = comments.filter(created__gte=created).filter(
+            Q(created__gt=created) | Q(pk__gt=pk)
+        )
+    return comments
+
+
+def get_comments_page(comments, cursor=None):
+    """Отдаёт страницу комментариев после курсора и курсор следующей."""
+    page_size = settings.COMMENTS_COUNT_ON_PAGE
+    page = list(comments_after(comments, cursor)[:page_size + 1])
+    next_cursor = None
+    if len(page) > page_size:
+        page = page[:page_size]
+        next_cursor = encode_cursor(page[-1])
+    return page, next_cursor
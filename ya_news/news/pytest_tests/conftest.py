@@ -2,11 +2,73 @@ from datetime import datetime, timedelta
 
 import pytest
 from django.conf import settings
+from django.core.cache import cache
 from django.urls import reverse
+from django.test import override_settings
 from django.test.client import Client
 from django.utils import timezone
 
 from news.models import Comment, News
+from news.querybudget import override_budgets
+
+
+def pytest_configure(config):
+    config.addinivalue_line(
+        'markers',
+        'query_budget(view_name, limit): предел SQL-запросов '
+        'представления в этом тесте; None отключает проверку.',
+    )
+
+
+@pytest.fixture(autouse=True)
+def query_budgets(request):
+    """
+    Строгие бюджеты SQL-запросов на время теста.
+
+    Превышение бюджета из QUERY_BUDGETS валит тест, а маркер
+    query_budget задаёт предел представления для отдельного теста:
+
+        @pytest.mark.query_budget('news:home', 1)
+    """
+    # Ближайший маркер (у теста, а не у модуля) применяется последним.
+    budgets = dict(
+        marker.args
+        for marker in reversed(list(request.node.iter_markers('query_budget')))
+    )
+    with override_settings(QUERY_BUDGET_STRICT=True), override_budgets(
+        budgets
+    ):
+        yield budgets
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    """Каждый тест начинается с пустого кеша."""
+    cache.clear()
+
+
+@pytest.fixture(autouse=True)
+def primary_only(settings):
+    """Без фикстуры replica тесты читают только основную базу."""
+    settings.NEWS_REPLICA_DB = None
+
+
+@pytest.fixture
+def replica(settings):
+    """
+    Главная и новость читают со второй тестовой базы.
+
+    Тесту нужен маркер django_db(databases=['default', 'replica']).
+    """
+    settings.NEWS_REPLICA_DB = 'replica'
+    return 'replica'
+
+
+@pytest.fixture(params=(True, False), ids=('fts5', 'searchentry'))
+def search_backend(request, settings):
+    """Прогоняет тест поиска и на FTS5, и на запасном индексе."""
+    settings.NEWS_SEARCH_FTS = request.param
+    return request.param
 
 
 @pytest.fixture
@@ -111,6 +173,11 @@ def get_home_url(news):
     return reverse('news:home')
 
 
+@pytest.fixture
+def search_url():
+    return reverse('news:search')
+
+
 @pytest.fixture
 def login_url():
     return reverse('users:login')
@@ -1,7 +1,20 @@
+from http import HTTPStatus
+
 import pytest
+from asgiref.sync import async_to_sync
 from django.conf import settings
+from django.core.management import call_command
+from django.db import connection
+from django.db.models.signals import post_init
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
 
+from news.cache import stats as cache_stats
 from news.forms import CommentForm
+from news.models import Comment, News
+from news.moderation import process_batch
+from news.pagination import comments_after, encode_cursor
+from news.querybudget import QueryBudgetExceeded
 
 
 pytestmark = pytest.mark.django_db
@@ -28,6 +41,33 @@ def test_news_order(many_news, client, get_home_url):
     assert all_dates == sorted_dates
 
 
+def test_home_comment_count_single_query(
+        many_news, author, client, get_home_url, django_assert_num_queries):
+    """Счётчик комментариев на главной не загружает сами комментарии."""
+    Comment.objects.bulk_create(
+        Comment(news=news, author=author, text=f'Текст {index}')
+        for news in News.objects.all()
+        for index in range(3)
+    )
+    call_command('recount_comments')
+    built_comments = []
+
+    def on_init(sender, instance, **kwargs):
+        built_comments.append(instance)
+
+    post_init.connect(on_init, sender=Comment)
+    try:
+        with django_assert_num_queries(1):
+            response = client.get(get_home_url)
+    finally:
+        post_init.disconnect(on_init, sender=Comment)
+
+    assert built_comments == []
+    for news in response.context['object_list']:
+        assert news.comment_count == 3
+    assert 'Комментариев: 3' in response.content.decode()
+
+
 def test_comment_order(client, news, get_detail_url):
     url = get_detail_url(news)
     response = client.get(url)
@@ -57,3 +97,337 @@ def test_authorized_client_has_form(not_author_client, get_detail_url, news):
 
     assert 'form' in response.context
     assert isinstance(response.context['form'], CommentForm)
+
+
+def test_detail_comments_keyset_pages(
+        many_comments, news, client, settings, get_detail_url):
+    """Комментарии к новости отдаются страницами по курсору."""
+    settings.COMMENTS_COUNT_ON_PAGE = 4
+    url = get_detail_url(news)
+    seen = []
+    cursor = None
+    while True:
+        response = client.get(url, {'after': cursor} if cursor else {})
+        page = response.context['comments']
+        assert len(page) <= settings.COMMENTS_COUNT_ON_PAGE
+        seen.extend(page)
+        cursor = response.context['next_cursor']
+        if cursor is None:
+            break
+
+    assert [comment.pk for comment in seen] == list(
+        news.comment_set.order_by('created', 'pk').values_list(
+            'pk', flat=True)
+    )
+
+
+def test_comments_fragment_page(
+        many_comments, news, client, settings, get_detail_url):
+    settings.COMMENTS_COUNT_ON_PAGE = 4
+    first = client.get(get_detail_url(news))
+    cursor = first.context['next_cursor']
+    response = client.get(
+        reverse('news:comments', args=(news.pk,)), {'after': cursor}
+    )
+    assert response.status_code == HTTPStatus.OK
+    assert '<html>' not in response.content.decode()
+    assert response.context['comments'][0].created > (
+        first.context['comments'][-1].created
+    )
+
+
+def test_comments_fragment_rejects_broken_cursor(client, news):
+    response = client.get(
+        reverse('news:comments', args=(news.pk,)), {'after': 'oops'}
+    )
+    assert response.status_code == HTTPStatus.NOT_FOUND
+
+
+def test_anonymous_detail_served_from_cache(
+        many_comments, news, client, get_detail_url,
+        django_assert_num_queries):
+    """Повторное анонимное чтение новости не обращается к базе."""
+    url = get_detail_url(news)
+    first = client.get(url)
+    with django_assert_num_queries(0):
+        second = client.get(url)
+    assert second.content == first.content
+
+
+def test_detail_cache_invalidated_by_comment(
+        news, client, not_author_client, get_detail_url):
+    url = get_detail_url(news)
+    client.get(url)
+    not_author_client.post(url, data={'text': 'Свежий комментарий'})
+    process_batch()
+    response = client.get(url)
+    assert 'Свежий комментарий' in response.content.decode()
+
+
+def test_detail_cache_invalidated_by_news_change(
+        news, client, get_detail_url):
+    url = get_detail_url(news)
+    client.get(url)
+    news.title = 'Новый заголовок'
+    news.save()
+    response = client.get(url)
+    assert news.title in response.content.decode()
+
+
+def test_cached_detail_shows_own_comment_links(
+        comment, client, author_client, not_author_client, get_detail_url,
+        get_edit_url):
+    """Общий кеш не раздаёт чужим ссылки на правку комментариев."""
+    url = get_detail_url(comment.news)
+    edit_url = get_edit_url(comment)
+    assert edit_url not in client.get(url).content.decode()
+    assert edit_url in author_client.get(url).content.decode()
+    assert edit_url not in not_author_client.get(url).content.decode()
+
+
+def test_anonymous_home_served_from_cache(
+        many_news, client, get_home_url, django_assert_num_queries):
+    """Главная для анонимов отдаётся из кеша без запросов к базе."""
+    lookups = cache_stats.copy()
+    first = client.get(get_home_url)
+    with django_assert_num_queries(0):
+        second = client.get(get_home_url)
+
+    assert first['X-Cache'] == 'MISS'
+    assert second['X-Cache'] == 'HIT'
+    assert second.content == first.content
+    assert cache_stats['home_page', 'hit'] == lookups['home_page', 'hit'] + 1
+    assert cache_stats['home_page', 'miss'] == (
+        lookups['home_page', 'miss'] + 1
+    )
+
+
+def test_home_cache_invalidated_by_news_and_comments(
+        news, client, not_author_client, get_home_url, get_detail_url):
+    client.get(get_home_url)
+    News.objects.create(title='Свежая новость', text='Текст')
+    assert 'Свежая новость' in client.get(get_home_url).content.decode()
+
+    not_author_client.post(get_detail_url(news), data={'text': 'Привет'})
+    process_batch()
+    assert 'Комментариев: 1' in client.get(get_home_url).content.decode()
+
+
+def test_authenticated_home_uses_list_fragment(
+        many_news, author_client, get_home_url):
+    first = author_client.get(get_home_url)
+    lookups = cache_stats.copy()
+    second = author_client.get(get_home_url)
+
+    assert cache_stats['home_list', 'hit'] == lookups['home_list', 'hit'] + 1
+    assert author_client.user.username in second.content.decode()
+    assert second.content == first.content
+
+
+def test_pending_comment_visible_only_to_author(
+        news, client, author_client, not_author_client, get_detail_url):
+    url = get_detail_url(news)
+    not_author_client.post(url, data={'text': 'Жду модерации'})
+
+    assert 'Жду модерации' in not_author_client.get(url).content.decode()
+    assert 'Жду модерации' not in author_client.get(url).content.decode()
+    assert 'Жду модерации' not in client.get(url).content.decode()
+
+
+def test_pending_comments_num_queries(
+        news, author, author_client, get_detail_url):
+    """Запросы страницы не растут с числом комментариев на модерации."""
+    url = get_detail_url(news)
+
+    def count_queries():
+        with CaptureQueriesContext(connection) as context:
+            author_client.get(url)
+        return len(context.captured_queries)
+
+    Comment.objects.create(
+        news=news, author=author, text='Первый',
+        status=Comment.Status.PENDING,
+    )
+    author_client.get(url)
+    one = count_queries()
+    Comment.objects.bulk_create(
+        Comment(news=news, author=author, text=f'Ещё {index}',
+                status=Comment.Status.PENDING)
+        for index in range(3)
+    )
+    assert count_queries() == one
+
+
+def search(client, search_url, query, after=None):
+    data = {'q': query}
+    if after:
+        data['after'] = after
+    return client.get(search_url, data)
+
+
+def test_search_finds_other_word_forms(
+        search_backend, client, search_url, news):
+    news.title = 'Редиска подорожала'
+    news.save()
+    response = search(client, search_url, 'редиски')
+    assert list(response.context['object_list']) == [news]
+
+
+def test_search_finds_news_by_approved_comment(
+        search_backend, client, search_url, news, author):
+    Comment.objects.create(
+        news=news, author=author, text='Салат с огурцами'
+    )
+    Comment.objects.create(
+        news=news, author=author, text='Салат с помидорами',
+        status=Comment.Status.PENDING,
+    )
+    assert list(search(client, search_url, 'огурцы').context[
+        'object_list'
+    ]) == [news]
+    assert not search(client, search_url, 'помидоры').context[
+        'object_list'
+    ]
+
+
+def test_search_ranks_title_above_text(search_backend, client, search_url):
+    in_text = News.objects.create(title='Погода', text='Ожидается гроза')
+    in_title = News.objects.create(title='Гроза', text='Ожидается дождь')
+    response = search(client, search_url, 'гроза')
+    assert list(response.context['object_list']) == [in_title, in_text]
+
+
+def test_search_keyset_pages(search_backend, client, search_url):
+    News.objects.bulk_create(
+        News(title=f'Новость {index}', text='Прогноз погоды')
+        for index in range(settings.SEARCH_RESULTS_ON_PAGE + 5)
+    )
+    # bulk_create не шлёт сигналов, индекс строится командой.
+    call_command('rebuild_search_index')
+    found, after = [], None
+    while True:
+        response = search(client, search_url, 'прогнозы', after)
+        found += response.context['object_list']
+        after = response.context['next_cursor']
+        if not after:
+            break
+    assert len(found) == News.objects.count()
+    assert len(set(found)) == len(found)
+
+
+def test_search_rejects_broken_cursor(search_backend, client, search_url):
+    response = search(client, search_url, 'новость', 'сломан')
+    assert response.status_code == HTTPStatus.NOT_FOUND
+
+
+def server_timing(response):
+    return dict(
+        item.split(';dur=') for item in response['Server-Timing'].split(', ')
+    )
+
+
+def test_server_timing_phases(author_client, news, get_detail_url):
+    response = author_client.post(get_detail_url(news), data={'text': 'Ок'})
+    assert set(server_timing(response)) == {
+        'resolve', 'db', 'form', 'total'
+    }
+    response = author_client.get(get_detail_url(news))
+    phases = server_timing(response)
+    assert {'resolve', 'db', 'render', 'total'} <= set(phases)
+    assert float(phases['render']) <= float(phases['total'])
+
+
+def test_metrics_count_requests_per_view(client, news, get_detail_url):
+    labels = 'view="news:detail",method="GET",phase="total"'
+    client.get(get_detail_url(news))
+    before = client.get(reverse('metrics')).content.decode()
+    client.get(get_detail_url(news))
+    after = client.get(reverse('metrics')).content.decode()
+
+    def count(text):
+        prefix = f'yanews_request_phase_seconds_count{{{labels}}} '
+        for line in text.splitlines():
+            if line.startswith(prefix):
+                return int(line[len(prefix):])
+
+    assert count(after) == count(before) + 1
+
+
+def async_get(async_client, url):
+    """GET через ASGI-обработчик Django из синхронного теста."""
+    async def get():
+        return await async_client.get(url)
+    return async_to_sync(get)()
+
+
+def test_asgi_detail_for_user(news, async_client, author, get_detail_url):
+    async_client.force_login(author)
+    response = async_get(async_client, get_detail_url(news))
+    assert isinstance(response.context['form'], CommentForm)
+
+
+@pytest.mark.query_budget('news:detail', 0)
+def test_asgi_requests_keep_query_budget(news, async_client, get_detail_url):
+    """Запросы из потоков sync_to_async попадают в бюджет."""
+    with pytest.raises(QueryBudgetExceeded):
+        async_get(async_client, get_detail_url(news))
+
+
+def test_metrics_group_unknown_methods(client, news, get_detail_url):
+    """Произвольный метод не заводит новый ряд метрик."""
+    client.generic('BREW', get_detail_url(news))
+    metrics = client.get(reverse('metrics')).content.decode()
+    assert 'view="news:detail",method="other"' in metrics
+    assert 'BREW' not in metrics
+
+
+def test_metrics_export_cache_lookups(client, news, get_detail_url):
+    client.get(get_detail_url(news))
+    client.get(get_detail_url(news))
+    metrics = client.get(reverse('metrics')).content.decode()
+    for fragment in ('story', 'comments'):
+        for result in ('hit', 'miss'):
+            labels = f'fragment="{fragment}",result="{result}"'
+            assert f'news_cache_lookups_total{{{labels}}} ' in metrics
+
+
+HOT_QUERIES = {
+    'home': (
+        lambda comment: News.objects.all()[:settings.NEWS_COUNT_ON_HOME_PAGE],
+        'news_date_id_idx',
+    ),
+    'comments_page': (
+        lambda comment: comments_after(
+            Comment.objects.filter(
+                news_id=comment.news_id, status=Comment.Status.APPROVED
+            ).select_related('author'),
+            encode_cursor(comment),
+        )[:settings.COMMENTS_COUNT_ON_PAGE + 1],
+        'comment_news_created_idx (news_id=? AND created>?)',
+    ),
+    'pending_comments': (
+        lambda comment: Comment.objects.filter(
+            news_id=comment.news_id,
+            author_id=comment.author_id,
+            status=Comment.Status.PENDING,
+        ),
+        'comment_news_created_idx',
+    ),
+    'duplicate_check': (
+        lambda comment: Comment.objects.filter(
+            author_id=comment.author_id,
+            text=comment.text,
+            created__gte=comment.created,
+            pk__lt=comment.pk,
+        ).order_by()[:1],
+        'comment_author_id_idx',
+    ),
+}
+
+
+@pytest.mark.parametrize('name', HOT_QUERIES)
+def test_hot_queries_use_index_without_sort(name, comment):
+    make_queryset, index = HOT_QUERIES[name]
+    plan = make_queryset(comment).explain()
+    assert index in plan
+    assert 'TEMP B-TREE' not in plan
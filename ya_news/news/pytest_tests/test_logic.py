@@ -1,8 +1,26 @@
+import json
+import time
+from http import HTTPStatus
+from io import StringIO
+
 import pytest
 from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY
+from django.core.management import call_command
+from django.db import connection
+from django.db.backends.sqlite3.base import DatabaseWrapper
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils.dateparse import parse_datetime
 
-from news.forms import BAD_WORDS, WARNING
-from news.models import Comment
+from news.auth import CACHED_BACKEND, MODEL_BACKEND
+from news.management.commands import load_news
+from news.forms import BAD_WORDS, WARNING, CommentForm, bad_words_filter
+from news.models import BannedWord, Comment, ModerationTask, News, SearchEntry
+from news.moderation import claim_tasks, process_batch, process_task
+from news.querybudget import QueryBudgetExceeded
+from news.replica import STICKY_COOKIE
+from news.search import FTS_TABLE, search_news
 
 
 FORM_DATA = {'text': settings.COMMENT_TEXT}
@@ -51,6 +69,36 @@ def test_user_cant_use_bad_words(not_author_client, news, get_detail_url):
     assert WARNING in form.errors['text']
 
 
+@pytest.mark.parametrize(
+    'text, is_bad',
+    (
+        ('Ну ты и РЕДИСКА!', True),
+        ('Какие-то негодяйчики', True),
+        ('Все они редиски', True),
+        ('Таких негодяев поискать', True),
+        ('Просто нормальный текст', False),
+    ),
+)
+def test_bad_words_forms(text, is_bad):
+    """Фильтр находит разные формы запрещённых слов."""
+    form = CommentForm(data={'text': text})
+    assert form.is_valid() is not is_bad
+
+
+def test_banned_words_from_database(django_assert_num_queries):
+    """Слова из таблицы подхватываются без перезапуска."""
+    text = {'text': 'Вот кочерыжки'}
+    assert CommentForm(data=text).is_valid()
+
+    BannedWord.objects.create(word='кочерыжка')
+    assert not CommentForm(data=text).is_valid()
+    with django_assert_num_queries(0):
+        assert not CommentForm(data=text).is_valid()
+
+    BannedWord.objects.all().delete()
+    assert CommentForm(data=text).is_valid()
+
+
 def test_author_can_delete_comment(author_client, news, comment,
                                    get_delete_url, get_detail_url):
     """Проверяет, что автор комментария может его удалить."""
@@ -96,3 +144,405 @@ def test_user_cant_edit_comment_of_another_user(
     assert comment.text == updated_comment.text
     assert updated_comment.author == commment_was.author
     assert updated_comment.news == commment_was.news
+
+
+def test_comment_count_follows_create_and_delete(
+        author_client, news, get_detail_url, get_delete_url):
+    """Счётчик комментариев меняется вместе с созданием и удалением."""
+    author_client.post(get_detail_url(news), data=FORM_DATA)
+    news.refresh_from_db()
+    assert news.comment_count == 0
+
+    process_batch()
+    news.refresh_from_db()
+    assert news.comment_count == 1
+
+    author_client.delete(get_delete_url(Comment.objects.get()))
+    news.refresh_from_db()
+    assert news.comment_count == 0
+
+
+def test_recount_comments_fixes_drift(news, comment):
+    News.objects.filter(pk=news.pk).update(comment_count=42)
+    call_command('recount_comments')
+    news.refresh_from_db()
+    assert news.comment_count == Comment.objects.filter(news=news).count()
+
+
+def test_new_comment_waits_for_moderation(
+        not_author_client, news, get_detail_url):
+    not_author_client.post(get_detail_url(news), data=FORM_DATA)
+    comment = Comment.objects.get()
+    assert comment.status == Comment.Status.PENDING
+    assert ModerationTask.objects.filter(comment=comment).exists()
+
+    assert process_batch() == 1
+    comment.refresh_from_db()
+    assert comment.status == Comment.Status.APPROVED
+    assert not ModerationTask.objects.exists()
+
+
+@pytest.mark.parametrize(
+    'text',
+    (
+        'http://a.ru http://b.ru http://c.ru',
+        'КУПИТЕ ДЕШЁВЫЕ ЧАСЫ!!!!!! www.example.com',
+    ),
+)
+def test_moderation_rejects_spam(not_author_client, news, get_detail_url,
+                                 text):
+    not_author_client.post(get_detail_url(news), data={'text': text})
+    process_batch()
+    assert Comment.objects.get().status == Comment.Status.REJECTED
+    news.refresh_from_db()
+    assert news.comment_count == 0
+
+
+def test_moderation_rejects_duplicate(
+        not_author_client, news, get_detail_url):
+    url = get_detail_url(news)
+    not_author_client.post(url, data=FORM_DATA)
+    not_author_client.post(url, data=FORM_DATA)
+    process_batch()
+    assert list(
+        Comment.objects.order_by('pk').values_list('status', flat=True)
+    ) == [Comment.Status.APPROVED, Comment.Status.REJECTED]
+
+
+def test_edited_comment_goes_back_to_moderation(
+        author_client, comment, get_edit_url):
+    author_client.post(get_edit_url(comment), data=FORM_DATA)
+    comment.refresh_from_db()
+    assert comment.status == Comment.Status.PENDING
+    assert ModerationTask.objects.filter(comment=comment).exists()
+
+
+def test_edit_during_moderation_is_moderated_again(
+        not_author_client, news, get_detail_url):
+    """Правка во время проверки не публикует текст без модерации."""
+    not_author_client.post(get_detail_url(news), data=FORM_DATA)
+    comment = Comment.objects.get()
+    [task] = claim_tasks(1)
+    not_author_client.post(
+        reverse('news:edit', args=(comment.pk,)),
+        data={'text': 'http://a.ru http://b.ru http://c.ru'},
+    )
+    process_task(task)
+    comment.refresh_from_db()
+    assert comment.status == Comment.Status.PENDING
+    assert ModerationTask.objects.filter(comment=comment).exists()
+
+    process_batch()
+    comment.refresh_from_db()
+    assert comment.status == Comment.Status.REJECTED
+
+
+def test_create_comment_num_queries(
+        author_client, news, get_detail_url, django_assert_num_queries):
+    """
+    Новость, две вставки и SAVEPOINT/RELEASE.
+
+    Сессия и пользователь после первого запроса берутся из кеша.
+    """
+    bad_words_filter.get()
+    author_client.get(reverse('news:home'))
+    with django_assert_num_queries(5):
+        author_client.post(get_detail_url(news), data=FORM_DATA)
+
+
+def test_edit_comment_num_queries(
+        author_client, comment, get_edit_url, django_assert_num_queries):
+    """
+    Комментарий, шесть записей и SAVEPOINT/RELEASE.
+
+    Одна из записей убирает комментарий из поискового индекса
+    при смене статуса.
+    """
+    bad_words_filter.get()
+    author_client.get(reverse('news:home'))
+    with django_assert_num_queries(9):
+        author_client.post(get_edit_url(comment), data=FORM_DATA)
+
+
+def test_delete_comment_num_queries(
+        author_client, comment, get_delete_url, django_assert_num_queries):
+    """
+    Комментарий, четыре записи и SAVEPOINT/RELEASE.
+
+    Одна из записей убирает комментарий из поискового индекса.
+    """
+    author_client.get(reverse('news:home'))
+    with django_assert_num_queries(7):
+        author_client.delete(get_delete_url(comment))
+
+
+def auth_queries(queries):
+    """Чтения сессии и пользователя; JOIN автора комментария не в счёт."""
+    return [
+        query['sql'] for query in queries
+        if 'FROM "django_session"' in query['sql']
+        or 'FROM "auth_user"' in query['sql']
+    ]
+
+
+def test_authenticated_page_makes_no_auth_queries(
+        author_client, news, get_detail_url):
+    """Сессия и пользователь берутся из кеша после первого запроса."""
+    url = get_detail_url(news)
+    author_client.get(url)
+    with CaptureQueriesContext(connection) as context:
+        response = author_client.get(url)
+    assert response.context['user'] == author_client.user
+    assert auth_queries(context.captured_queries) == []
+
+
+def test_user_cache_invalidated_on_save(author_client, author, get_home_url):
+    author_client.get(get_home_url)
+    author.username = 'Переименованный'
+    author.save()
+    response = author_client.get(get_home_url)
+    assert 'Переименованный' in response.content.decode()
+
+
+def test_password_change_ends_cached_sessions(
+        author_client, author, news, get_detail_url):
+    url = get_detail_url(news)
+    author_client.get(url)
+    author.set_password('новый пароль')
+    author.save()
+    assert not author_client.get(url).context['user'].is_authenticated
+
+
+def test_model_backend_session_moves_to_cache(
+        client, author, news, get_detail_url):
+    """Сессии, созданные до CachedModelBackend, переходят на него."""
+    client.force_login(author, backend=MODEL_BACKEND)
+    url = get_detail_url(news)
+    assert client.get(url).context['user'] == author
+    assert client.session[BACKEND_SESSION_KEY] == CACHED_BACKEND
+    with CaptureQueriesContext(connection) as context:
+        client.get(url)
+    assert auth_queries(context.captured_queries) == []
+
+
+def found_news(query):
+    return search_news(query)[0]
+
+
+def test_search_index_follows_news_changes(search_backend, news):
+    news.title = 'Выборы мэра'
+    news.save()
+    assert found_news('выборы') == [news]
+    news.title = 'Погода'
+    news.save()
+    assert found_news('выборы') == []
+    news.delete()
+    assert found_news('погода') == []
+
+
+def test_search_index_follows_moderation(
+        search_backend, author_client, news, get_detail_url):
+    author_client.post(get_detail_url(news), data={'text': 'Отличная статья'})
+    assert found_news('статья') == []
+    process_batch()
+    assert found_news('статья') == [news]
+    comment = Comment.objects.get()
+    author_client.post(
+        reverse('news:edit', args=(comment.pk,)), data={'text': 'Плохо'}
+    )
+    assert found_news('статья') == []
+    comment.delete()
+    assert found_news('плохо') == []
+
+
+def test_rebuild_search_index(search_backend, news, comment):
+    SearchEntry.objects.all().delete()
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE}')
+    call_command('rebuild_search_index')
+    assert found_news('заголовок') == [news]
+    assert found_news('commenta') == [news]
+
+
+FIXTURE_PATH = settings.BASE_DIR / 'news' / 'fixtures' / 'news.json'
+
+
+def fixture_titles():
+    with open(FIXTURE_PATH, encoding='utf-8') as file:
+        return sorted(item['fields']['title'] for item in json.load(file))
+
+
+@pytest.mark.parametrize('chunk_size', (7, load_news.CHUNK_SIZE))
+def test_load_news_streams_json_fixture(monkeypatch, chunk_size):
+    """Куски файла меньше объекта не мешают разбору массива."""
+    monkeypatch.setattr(load_news, 'CHUNK_SIZE', chunk_size)
+    stdout = StringIO()
+    call_command('load_news', FIXTURE_PATH, batch_size=5, stdout=stdout)
+    assert sorted(
+        News.objects.values_list('title', flat=True)
+    ) == fixture_titles()
+    assert 'строк/с' in stdout.getvalue()
+
+
+def test_load_news_jsonl_with_comments(author, tmp_path):
+    created = '2022-01-01T10:00:00Z'
+    rows = [
+        {'model': 'news.news', 'pk': 100,
+         'fields': {'title': 'Новость', 'text': 'Текст'}},
+        *(
+            {'model': 'news.comment', 'fields': {
+                'news': 100, 'author': author.pk,
+                'text': f'Комментарий {index}', 'created': created,
+            }}
+            for index in range(3)
+        ),
+    ]
+    path = tmp_path / 'news.jsonl'
+    path.write_text(
+        '\n'.join(json.dumps(row) for row in rows), encoding='utf-8'
+    )
+    call_command('load_news', path, batch_size=2, stdout=StringIO())
+    assert News.objects.get(pk=100).comment_count == 3
+    assert set(
+        Comment.objects.values_list('created', flat=True)
+    ) == {parse_datetime(created)}
+    # Загрузчик временно отключает auto_now_add и возвращает его.
+    assert Comment._meta.get_field('created').auto_now_add
+
+
+def test_load_news_refreshes_cached_story(
+        news, author, client, get_detail_url, tmp_path):
+    """Комментарии к уже открытой новости видны сразу после загрузки."""
+    url = get_detail_url(news)
+    client.get(url)
+    path = tmp_path / 'comments.jsonl'
+    path.write_text(json.dumps({'model': 'news.comment', 'fields': {
+        'news': news.pk, 'author': author.pk,
+        'text': 'Загруженный комментарий',
+    }}), encoding='utf-8')
+    call_command('load_news', path, stdout=StringIO())
+    assert 'Загруженный комментарий' in client.get(url).content.decode()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_load_news_restores_sqlite_sync():
+    def synchronous():
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA synchronous')
+            return cursor.fetchone()[0]
+
+    before = synchronous()
+    call_command('load_news', FIXTURE_PATH, no_sync=True, stdout=StringIO())
+    assert synchronous() == before
+    assert News.objects.count() == len(fixture_titles())
+
+
+@pytest.mark.query_budget('news:home', 0)
+def test_query_budget_exceeded_fails_test(author_client, get_home_url):
+    with pytest.raises(QueryBudgetExceeded):
+        author_client.get(get_home_url)
+
+
+@pytest.mark.query_budget('news:home', 0)
+def test_query_budget_only_logged_outside_tests(
+        author_client, get_home_url, settings, caplog):
+    settings.QUERY_BUDGET_STRICT = False
+    response = author_client.get(get_home_url)
+    assert response.wsgi_request.query_count > 0
+    assert 'news:home' in caplog.text
+
+
+def test_home_budget_catches_n_plus_one(
+        many_news, author_client, get_home_url, monkeypatch):
+    """Запрос комментариев на каждую новость выходит за бюджет главной."""
+    monkeypatch.setattr(
+        News, 'comment_count',
+        property(lambda news: news.comment_set.count()), raising=False,
+    )
+    with pytest.raises(QueryBudgetExceeded, match='news:home: 1[0-9] SQL'):
+        author_client.get(get_home_url)
+
+
+def test_sqlite_pragmas_on_new_connection(tmp_path):
+    """Каждое новое соединение с файлом базы получает SQLITE_PRAGMAS."""
+    wrapper = DatabaseWrapper(
+        {**connection.settings_dict, 'NAME': str(tmp_path / 'db.sqlite3')}
+    )
+    try:
+        with wrapper.cursor() as cursor:
+            values = {}
+            for name in settings.SQLITE_PRAGMAS:
+                cursor.execute(f'PRAGMA {name}')
+                values[name] = cursor.fetchone()[0]
+    finally:
+        wrapper.close()
+    assert values == {
+        'journal_mode': 'wal',
+        'synchronous': 1,
+        'busy_timeout': 5000,
+        'cache_size': -64 * 1024,
+        'mmap_size': 256 * 1024 * 1024,
+    }
+
+
+@pytest.mark.django_db(databases=['default', 'replica'])
+def test_news_pages_read_from_replica(replica, client):
+    replicated = News.objects.using(replica).create(
+        title='С реплики', text='Текст'
+    )
+    News.objects.create(title='Только в основной', text='Текст')
+    content = client.get(reverse('news:home')).content.decode()
+    assert 'С реплики' in content
+    assert 'Только в основной' not in content
+    response = client.get(reverse('news:detail', args=(replicated.pk,)))
+    assert response.status_code == HTTPStatus.OK
+
+
+@pytest.mark.django_db(databases=['default', 'replica'])
+def test_replica_reads_cached_for_lag(
+        replica, client, get_detail_url, monkeypatch):
+    """Прочитанное с реплики кешируется, но только на NEWS_REPLICA_LAG."""
+    news = News.objects.using(replica).create(title='Старый', text='Текст')
+    home_url = reverse('news:home')
+    assert client.get(home_url)['X-Cache'] == 'MISS'
+    assert client.get(home_url)['X-Cache'] == 'HIT'
+    client.get(get_detail_url(news))
+    News.objects.using(replica).filter(pk=news.pk).update(title='Новый')
+    later = time.time() + settings.NEWS_REPLICA_LAG + 1
+    monkeypatch.setattr(time, 'time', lambda: later)
+    home = client.get(home_url)
+    assert home['X-Cache'] == 'MISS'
+    assert 'Новый' in home.content.decode()
+    assert 'Новый' in client.get(get_detail_url(news)).content.decode()
+
+
+@pytest.mark.django_db(databases=['default', 'replica'])
+def test_author_reads_primary_after_comment(
+        replica, news, author_client, client, get_detail_url):
+    """Кука после записи показывает автору его комментарий до репликации."""
+    News.objects.using(replica).create(
+        pk=news.pk, title=news.title, text=news.text
+    )
+    url = get_detail_url(news)
+    response = author_client.post(url, data={'text': 'Свежий комментарий'})
+    assert response.cookies[STICKY_COOKIE]['max-age'] == (
+        settings.NEWS_REPLICA_LAG
+    )
+    assert 'Свежий комментарий' in author_client.get(url).content.decode()
+    assert 'Свежий комментарий' not in client.get(url).content.decode()
+
+
+@pytest.mark.django_db(databases=['default', 'replica'])
+def test_other_reads_use_primary(replica, news, client, search_url):
+    assert client.get(search_url, {'q': 'заголовок'}).context[
+        'object_list'
+    ] == [news]
+    assert News.objects.get() == news
+    assert STICKY_COOKIE not in client.cookies
+
+
+@pytest.mark.django_db(databases=['default', 'replica'], transaction=True)
+def test_sync_replica_copies_primary(replica, news):
+    assert not News.objects.using(replica).exists()
+    call_command('sync_replica', stdout=StringIO())
+    assert News.objects.using(replica).get().title == news.title
@@ -10,7 +10,8 @@ pytestmark = pytest.mark.django_db
 @pytest.mark.parametrize(
     'url_fixture',
     (pytest.lazy_fixture('get_home_url'), pytest.lazy_fixture('login_url'),
-     pytest.lazy_fixture('logout_url'), pytest.lazy_fixture('signup_url')),
+     pytest.lazy_fixture('logout_url'), pytest.lazy_fixture('signup_url'),
+     pytest.lazy_fixture('search_url')),
 )
 def test_pages_availability_for_anonymous_user(client, url_fixture):
     response = client.get(url_fixture)
@@ -67,3 +68,12 @@ def test_redirects(client, url_fixture, comment):
     expected_url = f'{login_url}?next={url}'
     response = client.get(url)
     assertRedirects(response, expected_url)
+
+
+@pytest.mark.parametrize(
+    'remote_addr, expected_status',
+    (('127.0.0.1', HTTPStatus.OK), ('10.0.0.1', HTTPStatus.NOT_FOUND)),
+)
+def test_metrics_only_for_local_clients(client, remote_addr, expected_status):
+    response = client.get(reverse('metrics'), REMOTE_ADDR=remote_addr)
+    assert response.status_code == expected_status
@@ -0,0 +1,137 @@
+"""
+Бюджет SQL-запросов на запрос к представлению.
+
+QueryBudgetMiddleware считает запросы к базе и их суммарное время
+за весь HTTP-запрос и сверяет число с бюджетом представления из
+настройки QUERY_BUDGETS (имя URL → предел). Превышение пишется
+в лог, а при QUERY_BUDGET_STRICT — ещё и поднимает исключение;
+так в тестах, см. news/pytest_tests/conftest.py.
+
+Счётчик текущего запроса лежит в ContextVar, а обёртка count_queries
+ставится на каждое соединение при его открытии: под ASGI запросы
+к базе идут из потоков sync_to_async, у которых свои соединения.
+
+Ответы потоком досчитываются уже после middleware и в бюджет
+не попадают.
+"""
+import asyncio
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+_overrides = {}
+_counter = ContextVar('query_counter', default=None)
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def get_budget(view_name):
+    """Предел запросов представления или None, если его нет."""
+    if view_name in _overrides:
+        return _overrides[view_name]
+    return settings.QUERY_BUDGETS.get(view_name)
+
+
+@contextmanager
+def override_budgets(budgets):
+    """Временно заменяет пределы из QUERY_BUDGETS, например в тесте."""
+    previous = dict(_overrides)
+    _overrides.update(budgets)
+    try:
+        yield
+    finally:
+        _overrides.clear()
+        _overrides.update(previous)
+
+
+class QueryCounter:
+    """Обёртка execute_wrapper: число запросов и их время в секундах."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+
+
+def count_queries(execute, sql, params, many, context):
+    counter = _counter.get()
+    if counter is None:
+        return execute(sql, params, many, context)
+    return counter(execute, sql, params, many, context)
+
+
+def install_counter(sender, connection, **kwargs):
+    """Приёмник connection_created, подключается в NewsConfig.ready."""
+    if count_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(count_queries)
+
+
+class QueryBudgetMiddleware:
+    """
+    Считает запросы каждого HTTP-запроса и проверяет бюджет.
+
+    Число и время запросов остаются в request.query_count
+    и request.query_duration. Работает и под WSGI, и под ASGI.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            # Так Django узнаёт асинхронную middleware, см. MiddlewareMixin.
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        counter = QueryCounter()
+        token = _counter.set(counter)
+        try:
+            response = self.get_response(request)
+        finally:
+            _counter.reset(token)
+        return self.finish(request, counter, response)
+
+    async def __acall__(self, request):
+        counter = QueryCounter()
+        token = _counter.set(counter)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _counter.reset(token)
+        return self.finish(request, counter, response)
+
+    def finish(self, request, counter, response):
+        request.query_count = counter.count
+        request.query_duration = counter.duration
+        match = request.resolver_match
+        if match:
+            self.check(match.view_name, counter)
+        return response
+
+    def check(self, view_name, counter):
+        budget = get_budget(view_name)
+        if budget is None or counter.count <= budget:
+            return
+        message = (
+            f'{view_name}: {counter.count} SQL-запросов при бюджете '
+            f'{budget}, {counter.duration * 1e3:.1f} мс'
+        )
+        logger.warning(message)
+        if settings.QUERY_BUDGET_STRICT:
+            raise QueryBudgetExceeded(message)
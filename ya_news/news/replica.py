@@ -0,0 +1,124 @@
+"""
+Чтение главной и страниц новостей с реплики.
+
+ReplicaMiddleware заводит на каждый запрос состояние в ContextVar
+и в process_view решает, можно ли читать с реплики: только GET и HEAD
+представлений из NEWS_REPLICA_VIEWS и только если у клиента нет куки
+STICKY_COOKIE. ReplicaRouter направляет чтение туда, а любую запись —
+в основную базу; после первой записи остаток запроса тоже читает
+основную базу, а ответ ставит куку на NEWS_REPLICA_LAG секунд, чтобы
+автор сразу увидел свой комментарий, пока реплика догоняет.
+
+Вне запросов (команды, фоновая модерация) всё идёт в основную базу.
+Версию фрагментов в кеше меняет запись в основную базу, и отстающая
+реплика сохранила бы под новой версией старые данные. Поэтому то, что
+прочитано с реплики, кешируется только на NEWS_REPLICA_LAG секунд
+(см. news.cache.cache_set).
+"""
+import asyncio
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+STICKY_COOKIE = 'news_read_primary'
+SAFE_METHODS = ('GET', 'HEAD')
+
+_state = ContextVar('replica_state', default=None)
+
+
+class ReplicaState:
+    """Можно ли читать с реплики, читали ли с неё и была ли запись."""
+
+    def __init__(self):
+        self.use_replica = False
+        self.read_replica = False
+        self.wrote = False
+
+
+def read_from_replica():
+    """Читал ли текущий запрос что-нибудь с реплики."""
+    state = _state.get()
+    return state is not None and state.read_replica
+
+
+class ReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if state is None or not state.use_replica:
+            return None
+        if not settings.NEWS_REPLICA_DB:
+            return None
+        state.read_replica = True
+        return settings.NEWS_REPLICA_DB
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.use_replica = False
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        """
+        Реплика — копия основной базы, связи между ними допустимы.
+
+        Так и при выключенной реплике: миграции на её псевдоним
+        всё равно применяются, например при создании тестовых баз.
+        """
+        return True
+
+
+class ReplicaMiddleware:
+    """
+    Состояние реплики на запрос и кука чтения из основной базы.
+
+    Должна стоять до SessionMiddleware, чтобы запись сессии
+    в ответе тоже ставила куку.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        state = ReplicaState()
+        token = _state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.reset(token)
+        return self.finish(state, response)
+
+    async def __acall__(self, request):
+        state = ReplicaState()
+        token = _state.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _state.reset(token)
+        return self.finish(state, response)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        state = _state.get()
+        if state is None or state.wrote:
+            return
+        state.use_replica = (
+            request.method in SAFE_METHODS
+            and request.resolver_match.view_name in settings.NEWS_REPLICA_VIEWS
+            and STICKY_COOKIE not in request.COOKIES
+        )
+
+    def finish(self, state, response):
+        if state.wrote:
+            response.set_cookie(
+                STICKY_COOKIE, '1', max_age=settings.NEWS_REPLICA_LAG,
+                httponly=True, samesite='Lax',
+            )
+        return response
@@ -0,0 +1,245 @@
+"""
+Полнотекстовый поиск по новостям и опубликованным комментариям.
+
+В индекс попадают не слова, а их основы (news.wordfilter.stem),
+поэтому «редиски» находит новость про «редиску». На SQLite с FTS5
+основы лежат в виртуальной таблице news_search_fts, иначе
+в запасном инвертированном индексе SearchEntry. Индекс обновляется
+при сохранении новостей и смене статуса комментариев, см. signals.py
+и moderation.change_status; заполнить его заново можно командой
+rebuild_search_index.
+"""
+import re
+from collections import Counter
+
+from django.conf import settings
+from django.db import DatabaseError, connection, transaction
+from django.db.models import Count, Q, Sum
+from django.http import Http404
+
+from .models import Comment, News, SearchEntry
+from .wordfilter import normalize, stem
+
+FTS_TABLE = 'news_search_fts'
+TITLE_WEIGHT = 3
+MAX_WEIGHT = 32767
+TERM_MAX_LENGTH = SearchEntry._meta.get_field('term').max_length
+CURSOR_SEPARATOR = '_'
+WORD_RE = re.compile(r'\w+')
+
+# Лучшая строка новости: сама новость или любой её комментарий.
+# Столбец rank — bm25 с весами из миграции 0006 (заголовок весит
+# TITLE_WEIGHT), он тем меньше, чем лучше совпадение. Функцию bm25
+# напрямую звать нельзя: SQLite разворачивает подзапрос под GROUP BY.
+SEARCH_SQL = f'''
+    SELECT news_id, MIN(rank) AS best FROM (
+        SELECT news_id, rank FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s
+    )
+    GROUP BY news_id
+    {{having}}
+    ORDER BY best, news_id
+    LIMIT %s
+'''
+AFTER_CURSOR = 'HAVING best > %s OR (best = %s AND news_id > %s)'
+
+_fts_available = {}
+
+
+def tokenize(text):
+    """Основы слов текста в порядке появления."""
+    return [
+        stem(word)[:TERM_MAX_LENGTH]
+        for word in WORD_RE.findall(normalize(text))
+    ]
+
+
+def fts_available():
+    """Включён ли FTS5 и есть ли его таблица; таблица ищется один раз."""
+    if not settings.NEWS_SEARCH_FTS:
+        return False
+    alias = connection.alias
+    if alias not in _fts_available:
+        _fts_available[alias] = (
+            connection.vendor == 'sqlite'
+            and FTS_TABLE in connection.introspection.table_names()
+        )
+    return _fts_available[alias]
+
+
+def connect_fts_table(sender, connection, **kwargs):
+    """
+    Подключает таблицу FTS сразу при открытии соединения.
+
+    Иначе FTS5 подключается при первой записи в индекс уже внутри
+    транзакции и берёт разделяемую блокировку; при параллельной записи
+    SQLite тогда сразу отвечает «database is locked», не дожидаясь.
+    """
+    if connection.vendor != 'sqlite':
+        return
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT 1 FROM {FTS_TABLE} LIMIT 0')
+    except DatabaseError:
+        # Таблицы ещё нет: миграции не применены или нет FTS5.
+        pass
+
+
+def _fts_replace(rowid, news_id, title, text):
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', (rowid,))
+        cursor.execute(
+            f'INSERT INTO {FTS_TABLE}(rowid, news_id, title, text) '
+            'VALUES (%s, %s, %s, %s)',
+            (rowid, news_id, ' '.join(title), ' '.join(text)),
+        )
+
+
+def _fts_delete(rowid):
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', (rowid,))
+
+
+def _entries(news_id, comment_id, title, text):
+    weights = Counter(text)
+    for term in title:
+        weights[term] += TITLE_WEIGHT
+    return [
+        SearchEntry(
+            term=term,
+            news_id=news_id,
+            comment_id=comment_id,
+            weight=min(weight, MAX_WEIGHT),
+        )
+        for term, weight in weights.items()
+    ]
+
+
+def index_news(news):
+    """Записывает в индекс заголовок и текст новости."""
+    title, text = tokenize(news.title), tokenize(news.text)
+    if fts_available():
+        _fts_replace(-news.pk, news.pk, title, text)
+        return
+    SearchEntry.objects.filter(news_id=news.pk, comment_id=None).delete()
+    SearchEntry.objects.bulk_create(_entries(news.pk, None, title, text))
+
+
+def unindex_news(news_id):
+    if fts_available():
+        _fts_delete(-news_id)
+    else:
+        SearchEntry.objects.filter(news_id=news_id, comment_id=None).delete()
+
+
+def index_comment(comment):
+    """Записывает в индекс текст комментария; статус не проверяется."""
+    text = tokenize(comment.text)
+    if fts_available():
+        _fts_replace(comment.pk, comment.news_id, (), text)
+        return
+    SearchEntry.objects.filter(comment_id=comment.pk).delete()
+    SearchEntry.objects.bulk_create(
+        _entries(comment.news_id, comment.pk, (), text)
+    )
+
+
+def unindex_comment(comment_id):
+    if fts_available():
+        _fts_delete(comment_id)
+    else:
+        SearchEntry.objects.filter(comment_id=comment_id).delete()
+
+
+def rebuild_index():
+    """Заполняет индекс заново; возвращает число новостей и комментариев."""
+    news_count = comment_count = 0
+    with transaction.atomic():
+        if fts_available():
+            with connection.cursor() as cursor:
+                cursor.execute(f'DELETE FROM {FTS_TABLE}')
+        else:
+            SearchEntry.objects.all().delete()
+        for news in News.objects.only('id', 'title', 'text').iterator():
+            index_news(news)
+            news_count += 1
+        comments = Comment.objects.filter(
+            status=Comment.Status.APPROVED
+        ).only('id', 'news_id', 'text')
+        for comment in comments.iterator():
+            index_comment(comment)
+            comment_count += 1
+    return news_count, comment_count
+
+
+def encode_cursor(rank, news_id):
+    return f'{rank!r}{CURSOR_SEPARATOR}{news_id}'
+
+
+def decode_cursor(cursor):
+    """Возвращает пару (rank, news_id) или 404 для испорченного курсора."""
+    try:
+        rank, news_id = cursor.split(CURSOR_SEPARATOR)
+        return float(rank), int(news_id)
+    except ValueError:
+        raise Http404('Некорректный курсор поиска.')
+
+
+def _search_fts(terms, after, limit):
+    match = ' '.join(f'"{term}"' for term in terms)
+    having, params = '', [match]
+    if after:
+        having = AFTER_CURSOR
+        params += [after[0], after[0], after[1]]
+    with connection.cursor() as cursor:
+        cursor.execute(SEARCH_SQL.format(having=having), params + [limit])
+        return [(news_id, rank) for news_id, rank in cursor.fetchall()]
+
+
+def _search_entries(terms, after, limit):
+    """
+    Поиск по запасному индексу.
+
+    Здесь все слова запроса ищутся в новости вместе с её обсуждением,
+    а не в одной строке, как в FTS5. Ранг — сумма весов со знаком
+    минус, чтобы, как и у bm25, меньший ранг был лучше.
+    """
+    results = (
+        SearchEntry.objects
+        .filter(term__in=terms)
+        .values('news_id')
+        .annotate(
+            matched=Count('term', distinct=True),
+            rank=-Sum('weight'),
+        )
+        .filter(matched=len(terms))
+        .order_by('rank', 'news_id')
+    )
+    if after:
+        rank, news_id = after
+        results = results.filter(
+            Q(rank__gt=rank) | Q(rank=rank, news_id__gt=news_id)
+        )
+    return list(results.values_list('news_id', 'rank')[:limit])
+
+
+def search_news(query, cursor=None):
+    """
+    Страница новостей по запросу и курсор следующей.
+
+    Страницы идут по паре (ранг, id) без OFFSET, как комментарии
+    в pagination.py: ранг при том же индексе каждый раз одинаков.
+    """
+    terms = list(dict.fromkeys(tokenize(query)))
+    if not terms:
+        return [], None
+    after = decode_cursor(cursor) if cursor else None
+    page_size = settings.SEARCH_RESULTS_ON_PAGE
+    search = _search_fts if fts_available() else _search_entries
+    rows = search(terms, after, page_size + 1)
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        next_cursor = encode_cursor(rows[-1][1], rows[-1][0])
+    news = News.objects.in_bulk([news_id for news_id, _ in rows])
+    page = [news[news_id] for news_id, _ in rows if news_id in news]
+    return page, next_cursor
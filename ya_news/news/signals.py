@@ -0,0 +1,47 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .cache import (
+    bump_banned_words_version, bump_home_version, bump_story_version
+)
+from .models import BannedWord, Comment, News
+from .search import index_comment, index_news, unindex_comment, unindex_news
+
+
+@receiver((post_save, post_delete), sender=News)
+def invalidate_story(sender, instance, **kwargs):
+    """Сбрасывает кеш новости и главной при изменении новости."""
+    bump_story_version(instance.pk)
+    bump_home_version()
+
+
+@receiver((post_save, post_delete), sender=BannedWord)
+def invalidate_banned_words(sender, instance, **kwargs):
+    bump_banned_words_version()
+
+
+@receiver(post_save, sender=News)
+def update_news_index(sender, instance, **kwargs):
+    index_news(instance)
+
+
+@receiver(post_delete, sender=News)
+def remove_news_index(sender, instance, **kwargs):
+    unindex_news(instance.pk)
+
+
+@receiver(post_save, sender=Comment)
+def update_comment_index(sender, instance, **kwargs):
+    """
+    Обновляет текст опубликованного комментария в индексе.
+
+    Статус меняется только через moderation.change_status, которая
+    сама добавляет комментарий в индекс и убирает из него.
+    """
+    if instance.status == Comment.Status.APPROVED:
+        index_comment(instance)
+
+
+@receiver(post_delete, sender=Comment)
+def remove_comment_index(sender, instance, **kwargs):
+    unindex_comment(instance.pk)
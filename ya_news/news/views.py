@@ -1,49 +1,204 @@
+from collections import namedtuple
+
 from django.conf import settings
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse
 from django.shortcuts import get_object_or_404
+from django.template.loader import render_to_string
 from django.urls import reverse
 from django.views import generic
 
+from .cache import (
+    bump_home_version, bump_story_version, cache_set, comments_key,
+    get_home_version, get_story_version, home_list_key, home_page_key,
+    record_lookup, story_key
+)
 from .forms import CommentForm
 from .models import Comment, News
+from .moderation import add_comment_count, change_status, enqueue
+from .pagination import decode_cursor, get_comments_page
+from .search import search_news
 
 
 class NewsList(generic.ListView):
-    """Список новостей."""
+    """
+    Список новостей.
+
+    Анонимам страница целиком отдаётся из кеша, авторизованным
+    пользователям из кеша берётся фрагмент со списком новостей.
+    """
     model = News
     template_name = 'news/home.html'
 
+    def get(self, request, *args, **kwargs):
+        self.home_version = get_home_version()
+        if request.user.is_authenticated:
+            return super().get(request, *args, **kwargs)
+        key = home_page_key(self.home_version)
+        content = cache.get(key)
+        record_lookup('home_page', content is not None)
+        if content is not None:
+            response = HttpResponse(content)
+            response['X-Cache'] = 'HIT'
+            return response
+        response = super().get(request, *args, **kwargs)
+        response['X-Cache'] = 'MISS'
+        response.add_post_render_callback(
+            lambda response: cache_set(key, response.content)
+        )
+        return response
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        key = home_list_key(self.home_version)
+        news_list = cache.get(key)
+        record_lookup('home_list', news_list is not None)
+        if news_list is None:
+            news_list = render_to_string('includes/news_list.html', context)
+            cache_set(key, news_list)
+        context['news_list'] = news_list
+        return context
+
     def get_queryset(self):
         """
         Выводим только несколько последних новостей.
 
         Их количество определяется в настройках проекта.
+        Число комментариев берётся из поля comment_count,
+        сами комментарии не загружаются.
         """
-        return self.model.objects.prefetch_related(
-            'comment_set'
-        )[:settings.NEWS_COUNT_ON_HOME_PAGE]
+        return self.model.objects.all()[:settings.NEWS_COUNT_ON_HOME_PAGE]
+
+
+CommentFragment = namedtuple(
+    'CommentFragment', ('pk', 'author_id', 'created', 'html')
+)
 
 
-class NewsDetail(generic.DetailView):
+class StoryFragmentsMixin:
+    """
+    Отрендеренные фрагменты новости и её комментариев из кеша.
+
+    Фрагменты общие для всех читателей, поэтому ссылки на редактирование
+    и удаление своих комментариев рисуются в шаблоне поверх них.
+    """
+
+    def get_story_fragment(self, news_id, version):
+        key = story_key(news_id, version)
+        story = cache.get(key)
+        record_lookup('story', story is not None)
+        if story is None:
+            if getattr(self, 'object', None) is None:
+                self.object = get_object_or_404(News, pk=news_id)
+            story = render_to_string(
+                'includes/story.html', {'news': self.object}
+            )
+            cache_set(key, story)
+        return story
+
+    def get_comments_fragments(self, news_id, version):
+        cursor = self.request.GET.get('after')
+        if cursor:
+            decode_cursor(cursor)
+        key = comments_key(news_id, version, cursor)
+        fragments = cache.get(key)
+        record_lookup('comments', fragments is not None)
+        if fragments is None:
+            comments, next_cursor = get_comments_page(
+                Comment.objects.filter(
+                    news_id=news_id, status=Comment.Status.APPROVED
+                ).select_related('author'),
+                cursor,
+            )
+            fragments = {
+                'comments': [
+                    CommentFragment(
+                        comment.pk,
+                        comment.author_id,
+                        comment.created,
+                        render_to_string(
+                            'includes/comment.html', {'comment': comment}
+                        ),
+                    )
+                    for comment in comments
+                ],
+                'next_cursor': next_cursor,
+            }
+            cache_set(key, fragments)
+        return fragments
+
+    def get_pending_comments(self, news_id):
+        """Свои комментарии на модерации видны только автору."""
+        if not self.request.user.is_authenticated:
+            return []
+        return Comment.objects.filter(
+            news_id=news_id,
+            author=self.request.user,
+            status=Comment.Status.PENDING,
+        ).select_related('author')
+
+    def get_fragments_context(self, with_story=True):
+        news_id = self.kwargs['pk']
+        version = get_story_version(news_id)
+        context = {'news_id': news_id}
+        if with_story:
+            context['story'] = self.get_story_fragment(news_id, version)
+            context['pending_comments'] = self.get_pending_comments(news_id)
+        context.update(self.get_comments_fragments(news_id, version))
+        return context
+
+
+class NewsDetail(StoryFragmentsMixin, generic.DetailView):
+    """
+    Новость с первой страницей комментариев.
+
+    Новость загружается из базы только при промахе кеша,
+    анонимное чтение из кеша обходится без запросов.
+    """
     model = News
     template_name = 'news/detail.html'
 
-    def get_object(self, queryset=None):
-        obj = get_object_or_404(
-            self.model.objects.prefetch_related('comment_set__author'),
-            pk=self.kwargs['pk']
-        )
-        return obj
+    def get(self, request, *args, **kwargs):
+        self.object = None
+        context = self.get_context_data(**kwargs)
+        return self.render_to_response(context)
 
     def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
+        kwargs.update(self.get_fragments_context())
         if self.request.user.is_authenticated:
-            context['form'] = CommentForm()
-        return context
+            kwargs['form'] = CommentForm()
+        return super().get_context_data(**kwargs)
+
+
+class NewsComments(StoryFragmentsMixin, generic.TemplateView):
+    """Фрагмент со следующей страницей комментариев к новости."""
+    template_name = 'includes/comments.html'
+
+    def get_context_data(self, **kwargs):
+        kwargs.update(self.get_fragments_context(with_story=False))
+        return super().get_context_data(**kwargs)
+
+
+class NewsSearch(generic.TemplateView):
+    """Поиск по новостям и опубликованным комментариям."""
+    template_name = 'news/search.html'
+
+    def get_context_data(self, **kwargs):
+        query = self.request.GET.get('q', '').strip()
+        results, next_cursor = search_news(
+            query, self.request.GET.get('after')
+        )
+        kwargs.update(
+            query=query, object_list=results, next_cursor=next_cursor
+        )
+        return super().get_context_data(**kwargs)
 
 
 class NewsComment(
         LoginRequiredMixin,
+        StoryFragmentsMixin,
         generic.detail.SingleObjectMixin,
         generic.FormView
 ):
@@ -55,16 +210,25 @@ class NewsComment(
         self.object = self.get_object()
         return super().post(request, *args, **kwargs)
 
+    def get_context_data(self, **kwargs):
+        kwargs.update(self.get_fragments_context())
+        return super().get_context_data(**kwargs)
+
     def form_valid(self, form):
+        """Комментарий публикуется после фоновой модерации."""
         comment = form.save(commit=False)
         comment.news = self.object
         comment.author = self.request.user
-        comment.save()
+        comment.status = Comment.Status.PENDING
+        with transaction.atomic():
+            comment.save()
+            enqueue(comment, is_new=True)
         return super().form_valid(form)
 
     def get_success_url(self):
-        post = self.get_object()
-        return reverse('news:detail', kwargs={'pk': post.pk}) + '#comments'
+        return reverse(
+            'news:detail', kwargs={'pk': self.object.pk}
+        ) + '#comments'
 
 
 class NewsDetailView(generic.View):
@@ -83,9 +247,9 @@ class CommentBase(LoginRequiredMixin):
     model = Comment
 
     def get_success_url(self):
-        comment = self.get_object()
+        """Объект уже загружен представлением, новость не нужна."""
         return reverse(
-            'news:detail', kwargs={'pk': comment.news.pk}
+            'news:detail', kwargs={'pk': self.object.news_id}
         ) + '#comments'
 
     def get_queryset(self):
@@ -98,7 +262,30 @@ class CommentUpdate(CommentBase, generic.UpdateView):
     template_name = 'news/edit.html'
     form_class = CommentForm
 
+    def form_valid(self, form):
+        """
+        Изменённый текст снова уходит на модерацию.
+
+        Статус меняется до сохранения формы, чтобы сигнал post_save
+        не записывал в поисковый индекс текст, который сразу уберут.
+        """
+        with transaction.atomic():
+            change_status(self.object, Comment.Status.PENDING)
+            response = super().form_valid(form)
+            enqueue(self.object)
+        bump_story_version(self.object.news_id)
+        return response
+
 
 class CommentDelete(CommentBase, generic.DeleteView):
     """Удаление комментария."""
     template_name = 'news/delete.html'
+
+    def delete(self, request, *args, **kwargs):
+        with transaction.atomic():
+            response = super().delete(request, *args, **kwargs)
+            if self.object.status == Comment.Status.APPROVED:
+                add_comment_count(self.object.news_id, -1)
+        bump_story_version(self.object.news_id)
+        bump_home_version()
+        return response
@@ -0,0 +1,116 @@
+"""
+Поиск запрещённых слов в тексте комментария.
+
+Список слов один раз собирается в префиксное дерево и компилируется
+в одно регулярное выражение, поэтому проверка текста не зависит от
+длины списка так, как зависел перебор слов по одному.
+"""
+import re
+import threading
+
+# Окончания, которые отбрасываются, чтобы ловить другие формы слова:
+# «редиска» находит и «редиски», и «редиской».
+RUSSIAN_ENDINGS = tuple(sorted((
+    'а', 'я', 'о', 'е', 'ё', 'ы', 'и', 'у', 'ю', 'ь', 'й',
+    'ой', 'ей', 'ий', 'ый', 'ая', 'яя', 'ое', 'ее', 'ам', 'ям',
+    'ом', 'ем', 'ами', 'ями', 'ах', 'ях', 'ов', 'ев', 'ью',
+), key=len, reverse=True))
+MIN_STEM_LENGTH = 4
+
+
+def normalize(text):
+    return text.lower().replace('ё', 'е')
+
+
+def stem(word):
+    """Отрезает окончание, если остаётся достаточно длинная основа."""
+    for ending in RUSSIAN_ENDINGS:
+        if (word.endswith(ending)
+                and len(word) - len(ending) >= MIN_STEM_LENGTH):
+            return word[:-len(ending)]
+    return word
+
+
+def trie_pattern(words):
+    """Регулярное выражение из префиксного дерева слов."""
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = {}
+    return _node_pattern(trie)
+
+
+def _node_pattern(node):
+    is_end = '' in node
+    branches = [
+        re.escape(char) + _node_pattern(child)
+        for char, child in sorted(node.items()) if char
+    ]
+    if not branches:
+        return ''
+    if len(branches) == 1 and not is_end:
+        return branches[0]
+    pattern = '(?:' + '|'.join(branches) + ')'
+    return pattern + '?' if is_end else pattern
+
+
+class WordFilter:
+    """
+    Скомпилированный фильтр по списку слов.
+
+    Слова с отрезанным окончанием ищутся как начало слова в тексте,
+    короткие слова ищутся только целиком.
+    """
+
+    def __init__(self, words):
+        stems, whole_words = set(), set()
+        for word in filter(None, map(normalize, words)):
+            word_stem = stem(word)
+            (stems if word_stem != word else whole_words).add(word_stem)
+        branches = []
+        if stems:
+            branches.append(trie_pattern(stems))
+        if whole_words:
+            branches.append(trie_pattern(whole_words) + r'\b')
+        self.size = len(stems) + len(whole_words)
+        self.pattern = (
+            re.compile(r'\b(?:' + '|'.join(branches) + ')')
+            if branches else None
+        )
+
+    def search(self, text):
+        """Возвращает первое найденное слово или None."""
+        if self.pattern is None:
+            return None
+        match = self.pattern.search(normalize(text))
+        return match.group() if match else None
+
+
+class WordFilterCache:
+    """
+    Собранный фильтр, который пересобирается при смене версии списка.
+
+    Версия должна читаться дёшево (время изменения файла, ключ в кеше),
+    слова загружаются только когда версия изменилась.
+    """
+
+    def __init__(self, load_words, get_version):
+        self.load_words = load_words
+        self.get_version = get_version
+        self.version = None
+        self.filter = None
+        self.lock = threading.Lock()
+
+    def get(self):
+        version = self.get_version()
+        if self.filter is None or version != self.version:
+            with self.lock:
+                if self.filter is None or version != self.version:
+                    self.filter = WordFilter(self.load_words())
+                    self.version = version
+        return self.filter
+
+    def reset(self):
+        self.filter = None
@@ -1,3 +1,4 @@
+import os
 from pathlib import Path
 
 from django.urls import reverse_lazy
@@ -21,10 +22,14 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'news.timing.TimingMiddleware',
+    'news.querybudget.QueryBudgetMiddleware',
+    'news.replica.ReplicaMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
+    'news.auth.SessionBackendMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
@@ -34,7 +39,7 @@ ROOT_URLCONF = 'yanews.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'news.timing.TimedDjangoTemplates',
         'DIRS': [BASE_DIR / 'templates'],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -55,10 +60,62 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Соединение живёт между запросами, PRAGMA ставятся один раз.
+        'CONN_MAX_AGE': 60,
+    },
+    # Реплика для чтения, см. news/replica.py и NEWS_REPLICA_DB.
+    # Локально это второй файл SQLite, копию основной базы в него
+    # кладёт python manage.py sync_replica.
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db_replica.sqlite3',
+        'CONN_MAX_AGE': 60,
+    },
+}
+
+DATABASE_ROUTERS = ['news.replica.ReplicaRouter']
+
+# Псевдоним реплики в DATABASES; None отправляет всё в основную базу.
+# Реплика включается окружением, например NEWS_REPLICA_DB=replica,
+# когда её наполняет репликация или sync_replica.
+NEWS_REPLICA_DB = os.environ.get('NEWS_REPLICA_DB') or None
+
+# Представления, которые на GET читают с реплики.
+NEWS_REPLICA_VIEWS = ('news:home', 'news:detail')
+
+# Сколько секунд после записи клиент читает основную базу,
+# пока реплика её догоняет.
+NEWS_REPLICA_LAG = 10
+
+# PRAGMA для каждого нового соединения с SQLite, см. news/sqlite.py.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+    # Сколько миллисекунд ждать чужую запись вместо «database is locked».
+    'busy_timeout': 5000,
+    # Отрицательный cache_size — в КиБ: 64 МиБ страниц на соединение.
+    'cache_size': -64 * 1024,
+    'mmap_size': 256 * 1024 * 1024,
+}
+
+# Кеш процесса; для нескольких процессов подключите общий бэкенд,
+# например Memcached или Redis, иначе инвалидация будет локальной.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
     }
 }
 
 
+# Сессия читается из кеша, а пишется и в кеш, и в базу.
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+
+# Пользователь сессии тоже берётся из кеша, см. news/auth.py.
+# Сессии с путём ModelBackend переводит SessionBackendMiddleware.
+AUTHENTICATION_BACKENDS = ['news.auth.CachedModelBackend']
+
+USER_CACHE_TIMEOUT = 60 * 60
+
 AUTH_PASSWORD_VALIDATORS = []
 
 
@@ -81,4 +138,30 @@ LOGIN_REDIRECT_URL = reverse_lazy('news:home')
 
 NEWS_COUNT_ON_HOME_PAGE = 10
 
+COMMENTS_COUNT_ON_PAGE = 20
+
+NEWS_CACHE_TIMEOUT = 60 * 60
+
+SEARCH_RESULTS_ON_PAGE = 10
+
+# Искать через SQLite FTS5, если миграция смогла создать его таблицу;
+# иначе используется запасной индекс в таблице news_searchentry.
+NEWS_SEARCH_FTS = True
+
 COMMENT_TEXT = 'Новый текст'
+
+# Предел SQL-запросов на запрос к представлению, см. news/querybudget.py.
+# Превышение пишется в лог, а при QUERY_BUDGET_STRICT поднимает ошибку.
+QUERY_BUDGETS = {
+    'news:home': 3,
+    'news:detail': 8,
+    'news:comments': 1,
+    'news:search': 2,
+    'news:edit': 12,
+    'news:delete': 9,
+}
+
+QUERY_BUDGET_STRICT = False
+
+# Адреса, которым открыт /metrics/ с временем фаз запросов.
+METRICS_ALLOWED_IPS = ('127.0.0.1', '::1')
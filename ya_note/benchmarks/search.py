@@ -0,0 +1,66 @@
+"""
+Поиск по заметкам: FTS5 против LIKE.
+
+python -m benchmarks.search [--notes 1000000]
+"""
+import argparse
+import random
+import time
+
+from benchmarks import measure, setup_django, test_database
+
+SYLLABLES = ('ка', 'ло', 'ми', 'ра', 'ту', 'не', 'зо', 'пи', 'се', 'ду')
+VOCABULARY_SIZE = 20_000
+BATCH = 10_000
+
+
+def make_vocabulary(rng):
+    return [
+        ''.join(rng.choices(SYLLABLES, k=rng.randint(2, 5)))
+        for _ in range(VOCABULARY_SIZE)
+    ]
+
+
+def fill_notes(author, count, vocabulary, rng):
+    from notes.models import Note
+
+    for start in range(0, count, BATCH):
+        Note.objects.bulk_create(
+            Note(
+                title=' '.join(rng.choices(vocabulary, k=3)),
+                text=' '.join(rng.choices(vocabulary, k=40)),
+                slug=f'bench-{index}',
+                author=author,
+            )
+            for index in range(start, min(start + BATCH, count))
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--notes', type=int, default=200_000)
+    args = parser.parse_args()
+    setup_django()
+    from django.contrib.auth import get_user_model
+
+    from notes.search import search_notes, search_notes_like
+
+    rng = random.Random(0)
+    vocabulary = make_vocabulary(rng)
+    # Одно слово, два слова сразу и слово, которого нет в заметках.
+    queries = (vocabulary[0], f'{vocabulary[1]} {vocabulary[2]}', 'нетакого')
+    with test_database():
+        author = get_user_model().objects.create(username='bench')
+        start = time.perf_counter()
+        fill_notes(author, args.notes, vocabulary, rng)
+        print(f'заметок: {args.notes}, '
+              f'заполнение: {time.perf_counter() - start:.1f} с')
+        print(f'{"запрос":<24} {"FTS5, мс":>10} {"LIKE, мс":>10}')
+        for query in queries:
+            fts = measure(lambda: search_notes(author, query))
+            like = measure(lambda: search_notes_like(author, query))
+            print(f'{query:<24} {fts * 1e3:>10.2f} {like * 1e3:>10.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""
+Slug для 100 тысяч заметок с кешем транслитерации и без.
+
+Сначала меряется сама транслитерация заголовков, затем создание
+заметок через Note.save, где slug выводится из заголовка. Заголовки
+повторяются, как при импорте, поэтому часть заметок проходит и путь
+с занятым slug.
+
+python -m benchmarks.slugs --notes 100000 --titles 2000
+"""
+import argparse
+import random
+import time
+from contextlib import contextmanager
+
+from benchmarks import measure, setup_django, test_database
+
+
+def make_titles(notes, distinct_titles, seed=0):
+    """Заголовки как при импорте: много похожих и повторяющихся."""
+    rng = random.Random(seed)
+    words = ('Список', 'покупок', 'Идеи', 'для', 'проекта', 'Встреча',
+             'с', 'командой', 'Заметка', 'Планы', 'на', 'неделю')
+    distinct = [
+        ' '.join(rng.choices(words, k=rng.randint(2, 5)))
+        + f' {rng.randint(1, 50)}'
+        for _ in range(distinct_titles)
+    ]
+    return [rng.choice(distinct) for _ in range(notes)]
+
+
+@contextmanager
+def uncached_slugs():
+    """Note.save транслитерирует заголовок каждый раз заново."""
+    from pytils.translit import slugify
+
+    from notes import models
+
+    cached = models.slugify_title
+    models.slugify_title = slugify
+    try:
+        yield
+    finally:
+        models.slugify_title = cached
+
+
+def create_notes(author, titles):
+    """Секунды на создание заметок; slug подбирает Note.save."""
+    from django.db import transaction
+
+    from notes.models import Note
+
+    Note.objects.all().delete()
+    start = time.perf_counter()
+    with transaction.atomic():
+        for title in titles:
+            Note.objects.create(title=title, text='Текст', author=author)
+    return time.perf_counter() - start
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--notes', type=int, default=100_000)
+    parser.add_argument('--titles', type=int, default=2_000,
+                        help='Сколько разных заголовков.')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    setup_django()
+    from django.contrib.auth import get_user_model
+    from pytils.translit import slugify
+
+    from notes.slugs import slug_cache_stats, slugify_title
+
+    titles = make_titles(args.notes, args.titles)
+
+    def plain():
+        for title in titles:
+            slugify(title)
+
+    def cached():
+        slugify_title.cache_clear()
+        for title in titles:
+            slugify_title(title)
+
+    print(f'заметок: {args.notes}, разных заголовков: {args.titles}')
+    print('транслитерация:')
+    print(f'  без кеша: {measure(plain, repeat=3):.2f} с')
+    print(f'  с кешем:  {measure(cached, repeat=3):.2f} с')
+    with test_database():
+        author = get_user_model().objects.create(username='Автор')
+        with uncached_slugs():
+            plain_time = create_notes(author, titles)
+        slugify_title.cache_clear()
+        cached_time = create_notes(author, titles)
+    print('создание заметок через Note.save:')
+    print(f'  без кеша: {plain_time:.2f} с')
+    print(f'  с кешем:  {cached_time:.2f} с')
+    print(f'кеш: {slug_cache_stats()}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,182 @@
+"""
+Представления ya_note у авторов с 10 до 100 тысяч заметок.
+
+Для каждого автора через тестовый клиент меряются список (первая
+и последняя страница), заметка, создание с новым и с занятым slug,
+правка и удаление: медиана, p95 и число SQL-запросов. Результат
+пишется в JSON, чтобы сравнивать прогоны между собой.
+
+python -m benchmarks.views --notes 10 1000 100000 --output views.json
+"""
+import argparse
+import json
+import platform
+import sqlite3
+import statistics
+import time
+from http import HTTPStatus
+from itertools import count
+
+from benchmarks import percentile, setup_django, test_database
+
+BATCH = 10_000
+# Заголовки заметок автора повторяются по кругу, поэтому у каждого
+# заголовка много занятых slug с суффиксами -2, -3, …
+TITLE_GROUPS = 10
+
+
+def fill_notes(author, size):
+    """Заметки с уже разведёнными slug, как после создания по одной."""
+    from pytils.translit import slugify
+
+    from notes.models import Note
+
+    notes = []
+    for index in range(size):
+        title = f'Заметка {size} {index % TITLE_GROUPS}'
+        occurrence = index // TITLE_GROUPS
+        slug = slugify(title)
+        if occurrence:
+            slug += f'-{occurrence + 1}'
+        notes.append(Note(title=title, text='Текст заметки. ' * 20,
+                          slug=slug, author=author))
+        if len(notes) >= BATCH:
+            Note.objects.bulk_create(notes)
+            notes = []
+    Note.objects.bulk_create(notes)
+
+
+def run_scenario(func, prepare, expected, repeat):
+    """Задержка и число запросов func; prepare готовит каждый вызов."""
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    timings, queries = [], []
+    for _ in range(repeat):
+        argument = prepare()
+        with CaptureQueriesContext(connection) as context:
+            start = time.perf_counter()
+            response = func(argument)
+            timings.append(time.perf_counter() - start)
+        if response.status_code != expected:
+            raise RuntimeError(f'HTTP {response.status_code}')
+        queries.append(len(context))
+    return {
+        'median_ms': statistics.median(timings) * 1e3,
+        'p95_ms': percentile(timings, 0.95) * 1e3,
+        'queries': max(queries),
+    }
+
+
+def scenarios(author, size):
+    """Имя, вызов, подготовка и ожидаемый статус каждого замера."""
+    from django.conf import settings
+    from django.test import Client
+    from django.urls import reverse
+
+    from notes.models import Note
+
+    client = Client()
+    client.force_login(author)
+    notes = Note.objects.filter(author=author).order_by('id')
+    middle = notes[size // 2]
+    # Курсор последней страницы — id последней заметки предыдущей.
+    before_last = (size - 1) // settings.NOTES_COUNT_ON_PAGE
+    last_page = {}
+    if before_last:
+        last_page['after'] = notes[
+            before_last * settings.NOTES_COUNT_ON_PAGE - 1
+        ].pk
+    numbers = count()
+
+    def new_note():
+        return Note.objects.create(
+            title='Удалить', text='Текст', author=author,
+            slug=f'delete-{size}-{next(numbers)}',
+        )
+
+    def create(title):
+        return client.post(
+            reverse('notes:add'), {'title': title, 'text': 'Текст'}
+        )
+
+    def nothing():
+        return None
+
+    ok, found = HTTPStatus.OK, HTTPStatus.FOUND
+    return (
+        ('list_first_page', lambda _: client.get(reverse('notes:list')),
+         nothing, ok),
+        ('list_last_page',
+         lambda _: client.get(reverse('notes:list'), last_page),
+         nothing, ok),
+        ('detail',
+         lambda _: client.get(reverse('notes:detail', args=(middle.slug,))),
+         nothing, ok),
+        ('create_unique', create,
+         lambda: f'Новая {size} {next(numbers)}', found),
+        ('create_collision', create,
+         lambda: f'Заметка {size} 0', found),
+        ('update',
+         lambda _: client.post(
+             reverse('notes:edit', args=(middle.slug,)),
+             {'title': middle.title, 'text': 'Правка', 'slug': middle.slug},
+         ),
+         nothing, found),
+        ('delete',
+         lambda note: client.post(reverse('notes:delete', args=(note.slug,))),
+         new_note, found),
+    )
+
+
+def environment():
+    import django
+
+    return {
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'platform': platform.platform(),
+    }
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--notes', type=int, nargs='+',
+                        default=(10, 1_000, 100_000),
+                        help='Сколько заметок у каждого автора.')
+    parser.add_argument('--repeat', type=int, default=30)
+    parser.add_argument('--output', default='views.json')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    setup_django()
+    from django.contrib.auth import get_user_model
+    from django.test.utils import setup_test_environment
+
+    setup_test_environment()
+    results = {}
+    print(f'{"заметок":>8} {"замер":<18} {"медиана, мс":>12} '
+          f'{"p95, мс":>10} {"запросов":>9}')
+    with test_database():
+        for size in args.notes:
+            author = get_user_model().objects.create(username=f'user{size}')
+            fill_notes(author, size)
+            results[size] = {}
+            for name, func, prepare, expected in scenarios(author, size):
+                result = run_scenario(func, prepare, expected, args.repeat)
+                results[size][name] = result
+                print(f'{size:>8} {name:<18} {result["median_ms"]:>12.2f} '
+                      f'{result["p95_ms"]:>10.2f} {result["queries"]:>9}')
+    with open(args.output, 'w', encoding='utf-8') as file:
+        json.dump({
+            'params': vars(args),
+            'environment': environment(),
+            'results': results,
+        }, file, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -4,3 +4,16 @@ from django.apps import AppConfig
 class NotesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'notes'
+
+    def ready(self):
+        from django.contrib.auth import get_user_model
+        from django.db.backends.signals import connection_created
+        from django.db.models.signals import post_delete, post_save
+
+        from .auth import forget_user
+        from .search import connect_fts_table
+        from .sqlite import configure_connection
+        connection_created.connect(configure_connection)
+        connection_created.connect(connect_fts_table)
+        post_save.connect(forget_user, sender=get_user_model())
+        post_delete.connect(forget_user, sender=get_user_model())
@@ -0,0 +1,160 @@
+"""
+Массовый импорт и экспорт заметок в формате JSON Lines.
+
+Каждая строка — объект {"title": …, "text": …, "slug": …}, slug
+необязателен. Импорт читает строки потоком, проверяет каждую формой
+NoteForm, подбирает slug сразу всей пачке и сохраняет её одним
+bulk_create. Ошибка в строке не прерывает импорт: она отдаётся
+вместе с номером строки. Экспорт пишет строки в том же формате,
+читая заметки из базы порциями.
+"""
+import json
+from collections import Counter, namedtuple
+from functools import reduce
+from operator import or_
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+
+from .forms import WARNING, NoteForm
+from .models import (
+    DEFAULT_SLUG, SLUG_SUFFIX_RESERVE, Note, slug_candidates, slug_prefix,
+)
+from .slugs import slugify_title
+
+EXPORT_FIELDS = ('title', 'text', 'slug')
+
+RowError = namedtuple('RowError', ('line', 'message'))
+
+
+class NoteImporter:
+    """
+    Импорт заметок одного автора.
+
+    run() — генератор ошибок по строкам; число созданных заметок
+    накапливается в created. Ошибки разбора отдаются сразу, а занятый
+    slug выясняется при сохранении пачки, поэтому номера строк
+    в ошибках идут не по порядку.
+    """
+
+    def __init__(self, author, batch_size=None):
+        self.author = author
+        self.batch_size = batch_size or settings.NOTES_IMPORT_BATCH_SIZE
+        self.max_slug_length = Note._meta.get_field('slug').max_length
+        self.created = 0
+
+    def run(self, lines):
+        batch = []
+        for number, line in enumerate(lines, start=1):
+            if not line.strip():
+                continue
+            note, error = self.parse(line)
+            if error:
+                yield RowError(number, error)
+                continue
+            batch.append((number, note, not note.slug))
+            if len(batch) >= self.batch_size:
+                yield from self.save_batch(batch)
+                batch = []
+        if batch:
+            yield from self.save_batch(batch)
+
+    def parse(self, line):
+        """Заметка из строки или текст ошибки."""
+        try:
+            row = json.loads(line)
+        except ValueError as error:
+            return None, f'некорректный JSON: {error}'
+        if not isinstance(row, dict):
+            return None, 'ожидается объект JSON'
+        form = NoteForm(data=row)
+        if not form.is_valid():
+            return None, '; '.join(
+                f'{field}: {" ".join(messages)}'
+                for field, messages in form.errors.items()
+            )
+        form.instance.author = self.author
+        return form.instance, None
+
+    def save_batch(self, batch):
+        batch, errors = self.allocate_slugs(batch)
+        yield from errors
+        try:
+            with transaction.atomic():
+                Note.objects.bulk_create(note for _, note, _ in batch)
+        except IntegrityError:
+            # Slug заняли между подбором и вставкой: пачка
+            # сохраняется по одной заметке, как из формы.
+            yield from self.save_each(batch)
+            return
+        self.created += len(batch)
+
+    def save_each(self, batch):
+        for number, note, derived in batch:
+            if derived:
+                note.slug = ''
+            try:
+                with transaction.atomic():
+                    note.save()
+            except IntegrityError:
+                yield RowError(number, note.slug + WARNING)
+                continue
+            self.created += 1
+
+    def allocate_slugs(self, batch):
+        """
+        Подбирает slug всей пачке за один-два запроса.
+
+        Сначала проверяются заданные в строках slug и основы из
+        заголовков. Для основ, которые уже заняты или повторяются
+        в пачке, одним запросом читаются все занятые slug с тем же
+        началом, как это делает Note.save. Заданные slug подбираются
+        первыми, чтобы их не заняли суффиксы выведенных.
+        """
+        bases = {}
+        for number, note, derived in batch:
+            if derived:
+                bases[number] = slugify_title(note.title)[
+                    :self.max_slug_length
+                ] or DEFAULT_SLUG
+        wanted = Counter(
+            bases.get(number, note.slug) for number, note, _ in batch
+        )
+        taken = set(Note.objects.filter(
+            slug__in=wanted
+        ).values_list('slug', flat=True))
+        crowded = {
+            base for base in bases.values()
+            if base in taken or wanted[base] > 1
+        }
+        if crowded:
+            taken.update(Note.objects.filter(reduce(or_, (
+                slug_prefix(
+                    base[:self.max_slug_length - SLUG_SUFFIX_RESERVE]
+                )
+                for base in crowded
+            ))).values_list('slug', flat=True))
+        rows, errors = [], []
+        for number, note, derived in sorted(batch, key=lambda row: row[2]):
+            if derived:
+                note.slug = next(
+                    candidate for candidate in slug_candidates(
+                        bases[number], self.max_slug_length
+                    )
+                    if candidate not in taken
+                )
+            elif note.slug in taken:
+                errors.append(RowError(number, note.slug + WARNING))
+                continue
+            taken.add(note.slug)
+            rows.append((number, note, derived))
+        return rows, sorted(errors)
+
+
+def export_lines(notes, chunk_size=None):
+    """Строки JSON Lines; заметки читаются порциями по chunk_size."""
+    rows = notes.order_by('id').values(*EXPORT_FIELDS).iterator(
+        chunk_size=chunk_size or settings.NOTES_EXPORT_CHUNK_SIZE
+    )
+    for row in rows:
+        yield json.dumps(row, ensure_ascii=False) + '\n'
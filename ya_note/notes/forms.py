@@ -1,29 +1,26 @@
-from pytils.translit import slugify
-
 from django import forms
-from django.core.exceptions import ValidationError
 
 from .models import Note
+from .timing import TimedFormMixin
 
 WARNING = ' - такой slug уже существует, придумайте уникальное значение!'
 
 
-class NoteForm(forms.ModelForm):
+class NoteForm(TimedFormMixin, forms.ModelForm):
     """Форма для создания или обновления заметки."""
 
     class Meta:
         model = Note
         fields = ('title', 'text', 'slug')
 
-    def clean_slug(self):
-        """Обрабатывает случай, если slug не уникален."""
-        cleaned_data = super().clean()
-        slug = cleaned_data.get('slug')
-        if not slug:
-            title = cleaned_data.get('title')
-            slug = slugify(title)[:100]
-        if Note.objects.filter(
-                slug=slug
-        ).exclude(id=self.instance.pk).exists():
-            raise ValidationError(slug + WARNING)
-        return slug
+    def validate_unique(self):
+        """
+        Уникальность slug проверяет база при сохранении.
+
+        Проверка заранее стоила бы лишнего запроса и всё равно
+        не спасала бы от гонки двух одновременных запросов.
+        """
+
+    def add_slug_conflict_error(self):
+        slug = self.cleaned_data.get('slug')
+        self.add_error('slug', slug + WARNING)
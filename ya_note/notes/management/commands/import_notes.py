@@ -0,0 +1,46 @@
+import sys
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from notes.bulk import NoteImporter
+
+
+class Command(BaseCommand):
+    help = 'Импортирует заметки автора из файла JSON Lines.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('username', help='Автор заметок.')
+        parser.add_argument(
+            'path', help='Файл JSON Lines; «-» — стандартный ввод.'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=None,
+            help='Заметок в одном bulk_create; '
+                 'по умолчанию NOTES_IMPORT_BATCH_SIZE.',
+        )
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        try:
+            author = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError(
+                f'Пользователь {options["username"]} не найден.'
+            )
+        importer = NoteImporter(author, options['batch_size'])
+        if options['path'] == '-':
+            errors = self.import_lines(importer, sys.stdin)
+        else:
+            with open(options['path'], encoding='utf-8') as lines:
+                errors = self.import_lines(importer, lines)
+        self.stdout.write(
+            f'Создано заметок: {importer.created}, ошибок: {errors}'
+        )
+
+    def import_lines(self, importer, lines):
+        errors = 0
+        for error in importer.run(lines):
+            self.stderr.write(f'Строка {error.line}: {error.message}')
+            errors += 1
+        return errors
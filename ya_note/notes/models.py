@@ -1,7 +1,12 @@
 from django.conf import settings
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models import Q
 
-from pytils.translit import slugify
+from .slugs import slugify_title
+
+DEFAULT_SLUG = 'note'
+# Запас под суффикс вида «-123» при обрезке длинного slug.
+SLUG_SUFFIX_RESERVE = 10
 
 
 class Note(models.Model):
@@ -28,11 +33,63 @@ class Note(models.Model):
         on_delete=models.CASCADE,
     )
 
+    class Meta:
+        indexes = (
+            models.Index(
+                fields=('author', 'id'), name='notes_note_author_id_idx'
+            ),
+        )
+
     def __str__(self):
         return self.title
 
     def save(self, *args, **kwargs):
-        if not self.slug:
-            max_slug_length = self._meta.get_field('slug').max_length
-            self.slug = slugify(self.title)[:max_slug_length]
-        super().save(*args, **kwargs)
+        """
+        Пустой slug выводится из заголовка.
+
+        Занятость slug не проверяется заранее: запись сразу вставляется,
+        а при нарушении уникальности повторяется с суффиксом -2, -3, …
+        Так создание стоит одну запись и не падает при гонке.
+        """
+        if self.slug:
+            return super().save(*args, **kwargs)
+        max_slug_length = self._meta.get_field('slug').max_length
+        base = slugify_title(self.title)[:max_slug_length] or DEFAULT_SLUG
+        taken = None
+        for candidate in slug_candidates(base, max_slug_length):
+            if taken is not None and candidate in taken:
+                continue
+            self.slug = candidate
+            try:
+                with transaction.atomic():
+                    return super().save(*args, **kwargs)
+            except IntegrityError:
+                if taken is None:
+                    # Один запрос вместо перебора занятых суффиксов.
+                    taken = set(Note.objects.filter(slug_prefix(
+                        base[:max_slug_length - SLUG_SUFFIX_RESERVE]
+                    )).values_list('slug', flat=True))
+                    if candidate not in taken:
+                        raise
+                taken.add(candidate)
+
+
+def slug_prefix(prefix):
+    """
+    Условие «slug начинается с prefix» диапазоном по индексу slug.
+
+    startswith в SQLite превращается в LIKE … ESCAPE, который не может
+    пройти по индексу с BINARY-сравнением и читает всю таблицу.
+    """
+    upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+    return Q(slug__gte=prefix, slug__lt=upper)
+
+
+def slug_candidates(base, max_length):
+    """base, base-2, base-3, … с обрезкой до max_length."""
+    yield base
+    number = 2
+    while True:
+        suffix = f'-{number}'
+        yield base[:max_length - len(suffix)] + suffix
+        number += 1
@@ -0,0 +1,37 @@
+"""Keyset-пагинация списка заметок по id."""
+from django.conf import settings
+from django.http import Http404
+
+# Наибольшее значение INTEGER в SQLite.
+MAX_ID = 2 ** 63 - 1
+
+
+def decode_cursor(cursor):
+    """Возвращает id из курсора или 404 для испорченного курсора."""
+    try:
+        pk = int(cursor)
+    except ValueError:
+        pk = -1
+    if not 0 <= pk <= MAX_ID:
+        raise Http404('Некорректный курсор заметок.')
+    return pk
+
+
+def get_notes_page(notes, cursor=None):
+    """
+    Отдаёт страницу заметок после курсора и курсор следующей.
+
+    Условие id > курсора вместо OFFSET позволяет базе сразу перейти
+    к нужному месту индекса (author, id), а лишняя заметка в выборке
+    заменяет COUNT, поэтому любая страница стоит как первая.
+    """
+    page_size = settings.NOTES_COUNT_ON_PAGE
+    notes = notes.order_by('id')
+    if cursor:
+        notes = notes.filter(pk__gt=decode_cursor(cursor))
+    page = list(notes[:page_size + 1])
+    next_cursor = None
+    if len(page) > page_size:
+        page = page[:page_size]
+        next_cursor = str(page[-1].pk)
+    return page, next_cursor
@@ -0,0 +1,98 @@
+"""
+Бюджет SQL-запросов на запрос к представлению.
+
+QueryBudgetMiddleware считает запросы к базе и их суммарное время
+за весь HTTP-запрос и сверяет число с бюджетом представления из
+настройки QUERY_BUDGETS (имя URL → предел). Превышение пишется
+в лог, а при QUERY_BUDGET_STRICT — ещё и поднимает исключение;
+так в тестах, см. notes/tests/conftest.py.
+
+Ответы потоком досчитываются уже после middleware и в бюджет
+не попадают.
+"""
+import logging
+import time
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+_overrides = {}
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def get_budget(view_name):
+    """Предел запросов представления или None, если его нет."""
+    if view_name in _overrides:
+        return _overrides[view_name]
+    return settings.QUERY_BUDGETS.get(view_name)
+
+
+@contextmanager
+def override_budgets(budgets):
+    """Временно заменяет пределы из QUERY_BUDGETS, например в тесте."""
+    previous = dict(_overrides)
+    _overrides.update(budgets)
+    try:
+        yield
+    finally:
+        _overrides.clear()
+        _overrides.update(previous)
+
+
+class QueryCounter:
+    """Обёртка execute_wrapper: число запросов и их время в секундах."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+
+
+class QueryBudgetMiddleware:
+    """
+    Считает запросы каждого HTTP-запроса и проверяет бюджет.
+
+    Число и время запросов остаются в request.query_count
+    и request.query_duration.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        counter = QueryCounter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(counter))
+            response = self.get_response(request)
+        request.query_count = counter.count
+        request.query_duration = counter.duration
+        match = request.resolver_match
+        if match:
+            self.check(match.view_name, counter)
+        return response
+
+    def check(self, view_name, counter):
+        budget = get_budget(view_name)
+        if budget is None or counter.count <= budget:
+            return
+        message = (
+            f'{view_name}: {counter.count} SQL-запросов при бюджете '
+            f'{budget}, {counter.duration * 1e3:.1f} мс'
+        )
+        logger.warning(message)
+        if settings.QUERY_BUDGET_STRICT:
+            raise QueryBudgetExceeded(message)
@@ -0,0 +1,113 @@
+"""
+Полнотекстовый поиск по заметкам автора.
+
+На SQLite с FTS5 поиск идёт по виртуальной таблице notes_note_fts,
+которую миграция 0003 держит в синхроне с notes_note триггерами.
+Без неё используется медленный запасной вариант на icontains.
+"""
+import re
+from collections import namedtuple
+
+from django.db import DatabaseError, connection
+from django.db.models import Q
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .models import Note
+
+FTS_TABLE = 'notes_note_fts'
+SNIPPET_START = '\x02'
+SNIPPET_END = '\x03'
+SNIPPET_TOKENS = 12
+WORD_RE = re.compile(r'\w+')
+
+SEARCH_SQL = f'''
+    SELECT note.id, note.slug, note.title,
+           snippet({FTS_TABLE}, -1, %s, %s, '…', %s)
+    FROM {FTS_TABLE}
+    JOIN notes_note AS note ON note.id = {FTS_TABLE}.rowid
+    WHERE {FTS_TABLE} MATCH %s AND note.author_id = %s
+    ORDER BY bm25({FTS_TABLE}, 10.0, 1.0)
+    LIMIT %s
+'''
+
+_fts_available = {}
+
+
+def fts_available():
+    """Есть ли таблица FTS в текущей базе; проверяется один раз."""
+    alias = connection.alias
+    if alias not in _fts_available:
+        _fts_available[alias] = (
+            connection.vendor == 'sqlite'
+            and FTS_TABLE in connection.introspection.table_names()
+        )
+    return _fts_available[alias]
+
+
+def connect_fts_table(sender, connection, **kwargs):
+    """
+    Подключает таблицу FTS сразу при открытии соединения.
+
+    Иначе FTS5 подключается при первой записи в заметки уже внутри
+    транзакции и берёт разделяемую блокировку; при параллельной записи
+    SQLite тогда сразу отвечает «database is locked», не дожидаясь.
+    """
+    if connection.vendor != 'sqlite':
+        return
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT 1 FROM {FTS_TABLE} LIMIT 0')
+    except DatabaseError:
+        # Таблицы ещё нет: миграции не применены или нет FTS5.
+        pass
+
+
+def match_query(query):
+    """
+    Безопасный запрос FTS5 из пользовательского ввода.
+
+    Каждое слово берётся в кавычки и ищется как префикс,
+    поэтому операторы FTS5 во вводе не ломают запрос.
+    """
+    return ' '.join(f'"{word}"*' for word in WORD_RE.findall(query))
+
+
+def render_snippet(snippet):
+    return mark_safe(
+        escape(snippet)
+        .replace(SNIPPET_START, '<mark>')
+        .replace(SNIPPET_END, '</mark>')
+    )
+
+
+SearchResult = namedtuple('SearchResult', ('id', 'slug', 'title', 'snippet'))
+
+
+def search_notes(author, query, limit=50):
+    """Заметки автора, подходящие под запрос, от лучших к худшим."""
+    match = match_query(query)
+    if not match:
+        return []
+    if not fts_available():
+        return search_notes_like(author, query, limit)
+    with connection.cursor() as cursor:
+        cursor.execute(SEARCH_SQL, (
+            SNIPPET_START, SNIPPET_END, SNIPPET_TOKENS,
+            match, author.pk, limit,
+        ))
+        return [
+            SearchResult(note_id, slug, title, render_snippet(snippet))
+            for note_id, slug, title, snippet in cursor.fetchall()
+        ]
+
+
+def search_notes_like(author, query, limit=50):
+    """Запасной поиск подстрокой: полный просмотр заметок автора."""
+    return [
+        SearchResult(note.id, note.slug, note.title, note.text[:200])
+        for note in Note.objects.filter(
+            Q(title__icontains=query) | Q(text__icontains=query),
+            author=author,
+        )[:limit]
+    ]
@@ -0,0 +1,29 @@
+"""
+Транслитерация заголовков заметок в slug.
+
+Похожие заголовки при массовом импорте повторяются тысячи раз,
+поэтому результат запоминается в ограниченном LRU-кеше процесса.
+Размер кеша задаётся настройкой SLUG_CACHE_SIZE.
+"""
+from functools import lru_cache
+
+from django.conf import settings
+from pytils.translit import slugify
+
+
+@lru_cache(maxsize=settings.SLUG_CACHE_SIZE)
+def slugify_title(title):
+    return slugify(title)
+
+
+def slug_cache_stats():
+    """Попадания, промахи и доля попаданий кеша транслитерации."""
+    info = slugify_title.cache_info()
+    lookups = info.hits + info.misses
+    return {
+        'hits': info.hits,
+        'misses': info.misses,
+        'size': info.currsize,
+        'max_size': info.maxsize,
+        'hit_rate': info.hits / lookups if lookups else 0.0,
+    }
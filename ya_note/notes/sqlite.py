@@ -0,0 +1,22 @@
+"""
+Настройки SQLite для каждого нового соединения.
+
+PRAGMA из SQLITE_PRAGMAS выполняются прямо на соединении sqlite3,
+в обход курсора Django: так они не попадают ни в бюджет запросов,
+ни в лог. Вместе с CONN_MAX_AGE соединение переживает запрос,
+поэтому настройка стоит один раз на соединение, а не на запрос.
+
+WAL позволяет читать во время записи, а synchronous=NORMAL в режиме
+WAL теряет при сбое питания только последние транзакции, не портя
+базу. journal_mode сохраняется в файле базы, для базы в памяти
+SQLite его игнорирует.
+"""
+from django.conf import settings
+
+
+def configure_connection(sender, connection, **kwargs):
+    """Приёмник connection_created, подключается в NotesConfig.ready."""
+    if connection.vendor != 'sqlite':
+        return
+    for name, value in settings.SQLITE_PRAGMAS.items():
+        connection.connection.execute(f'PRAGMA {name} = {value}')
@@ -64,6 +64,8 @@ class BaseTestCase(TestCase):
         cls.url_done = reverse('notes:success')
         cls.url_delete = reverse('notes:delete', args=(cls.note3.slug,))
         cls.url_list = reverse('notes:list')
+        cls.url_search = reverse('notes:search')
+        cls.url_export = reverse('notes:export')
         cls.url_detail = reverse('notes:detail', args=(cls.note3.slug,))
         cls.url_login = reverse('users:login')
         cls.url_logout = reverse('users:logout')
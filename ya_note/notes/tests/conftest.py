@@ -0,0 +1,34 @@
+"""
+Строгие бюджеты SQL-запросов в тестах, см. notes/querybudget.py.
+
+Превышение бюджета из QUERY_BUDGETS валит тест, а маркер query_budget
+задаёт предел представления для отдельного теста:
+
+    @pytest.mark.query_budget('notes:list', 3)
+"""
+import pytest
+from django.test import override_settings
+
+from notes.querybudget import override_budgets
+
+
+def pytest_configure(config):
+    config.addinivalue_line(
+        'markers',
+        'query_budget(view_name, limit): предел SQL-запросов '
+        'представления в этом тесте; None отключает проверку.',
+    )
+
+
+@pytest.fixture(autouse=True)
+def query_budgets(request):
+    """Строгие бюджеты и пределы из маркеров на время теста."""
+    # Ближайший маркер (у теста, а не у модуля) применяется последним.
+    budgets = dict(
+        marker.args
+        for marker in reversed(list(request.node.iter_markers('query_budget')))
+    )
+    with override_settings(QUERY_BUDGET_STRICT=True), override_budgets(
+        budgets
+    ):
+        yield budgets
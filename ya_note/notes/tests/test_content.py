@@ -1,4 +1,13 @@
+from http import HTTPStatus
+
+from django.conf import settings
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
 from notes.forms import NoteForm
+from notes.models import Note
+from notes.slugs import slug_cache_stats
 from notes.tests.base_tests import BaseTestCase
 
 
@@ -25,3 +34,125 @@ class TestContent(BaseTestCase):
                 response = self.author_note.get(name)
                 self.assertIn('form', response.context)
                 self.assertIsInstance(response.context['form'], NoteForm)
+
+    def test_notes_list_is_paginated(self):
+        Note.objects.bulk_create(
+            Note(title=f'Note {index}', text='Text', slug=f'page-{index}',
+                 author=self.user)
+            for index in range(settings.NOTES_COUNT_ON_PAGE)
+        )
+        response = self.author_client.get(self.url_list)
+        self.assertEqual(
+            len(response.context['object_list']),
+            settings.NOTES_COUNT_ON_PAGE
+        )
+        response = self.author_client.get(
+            self.url_list, {'after': response.context['next_cursor']}
+        )
+        self.assertEqual(len(response.context['object_list']), 1)
+        self.assertIsNone(response.context['next_cursor'])
+
+    def test_notes_list_page_without_count(self):
+        """Страница по курсору читается одним запросом, без COUNT."""
+        self.author_client.get(self.url_list)
+        with CaptureQueriesContext(connection) as context:
+            self.author_client.get(self.url_list, {'after': self.note.pk})
+        self.assertEqual(len(context.captured_queries), 1)
+        self.assertNotIn('COUNT', context.captured_queries[0]['sql'])
+
+    def test_notes_list_bad_cursor_is_404(self):
+        for cursor in ('abc', '-1', str(2 ** 63)):
+            with self.subTest(cursor=cursor):
+                response = self.author_client.get(
+                    self.url_list, {'after': cursor}
+                )
+                self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+    def test_notes_list_does_not_select_text(self):
+        with CaptureQueriesContext(connection) as context:
+            self.author_client.get(self.url_list)
+        note_queries = [
+            query['sql'] for query in context.captured_queries
+            if 'FROM "notes_note"' in query['sql']
+        ]
+        self.assertTrue(note_queries)
+        for sql in note_queries:
+            self.assertNotIn('"notes_note"."text"', sql)
+
+    def search(self, query, client=None):
+        client = client or self.author_client
+        response = client.get(reverse('notes:search'), {'q': query})
+        return response.context['results']
+
+    def test_search_finds_only_own_notes(self):
+        results = self.search('note')
+        self.assertIn(self.note.id, [result.id for result in results])
+        self.assertNotIn(self.note2.id, [result.id for result in results])
+
+    def test_search_highlights_snippet(self):
+        self.note.text = 'Купить <b>молоко</b> и хлеб'
+        self.note.save()
+        results = self.search('молоко')
+        self.assertIn('<mark>молоко</mark>', results[0].snippet)
+        self.assertIn('&lt;b&gt;', results[0].snippet)
+
+    def test_search_follows_note_changes(self):
+        self.note.text = 'Совершенно другая кочерыжка'
+        self.note.save()
+        self.assertEqual(
+            [result.id for result in self.search('кочерыж')], [self.note.id]
+        )
+        self.note.delete()
+        self.assertEqual(self.search('кочерыжка'), [])
+
+    def test_search_ignores_query_syntax(self):
+        self.assertEqual(self.search('"( AND NOT'), [])
+
+    def test_server_timing_phases(self):
+        for response, phases in (
+            (self.author_note.get(self.url_list),
+             {'resolve', 'db', 'render', 'total'}),
+            (self.author_client.post(self.url_add, data=self.form_data),
+             {'resolve', 'db', 'form', 'total'}),
+        ):
+            with self.subTest(phases=phases):
+                self.assertEqual({
+                    item.split(';')[0]
+                    for item in response['Server-Timing'].split(', ')
+                }, phases)
+
+    def test_metrics_list_request_phases(self):
+        self.author_note.get(self.url_list)
+        metrics = self.client.get(reverse('metrics')).content.decode()
+        for phase in ('resolve', 'db', 'render', 'total'):
+            with self.subTest(phase=phase):
+                self.assertIn(
+                    'yanote_request_phase_seconds_sum{view="notes:list",'
+                    f'method="GET",phase="{phase}"}}',
+                    metrics,
+                )
+
+    def test_metrics_export_slug_cache(self):
+        Note.objects.create(title='Повтор', text='Text', author=self.user)
+        Note.objects.create(title='Повтор', text='Text', author=self.user)
+        metrics = self.client.get(reverse('metrics')).content.decode()
+        stats = slug_cache_stats()
+        self.assertIn(
+            f'notes_slug_cache_lookups_total{{result="hit"}} {stats["hits"]}',
+            metrics,
+        )
+        self.assertIn(
+            'notes_slug_cache_lookups_total{result="miss"} '
+            f'{stats["misses"]}',
+            metrics,
+        )
+        self.assertIn(
+            f'notes_slug_cache_hit_ratio {stats["hit_rate"]:.6f}', metrics
+        )
+
+    def test_metrics_group_unknown_methods(self):
+        """Произвольный метод не заводит новый ряд метрик."""
+        self.author_note.generic('BREW', self.url_list)
+        metrics = self.client.get(reverse('metrics')).content.decode()
+        self.assertIn('view="notes:list",method="other"', metrics)
+        self.assertNotIn('BREW', metrics)
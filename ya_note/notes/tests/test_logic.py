@@ -1,13 +1,35 @@
+import json
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 from http import HTTPStatus
+from io import StringIO
 
+import pytest
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.db.backends.sqlite3.base import DatabaseWrapper
+from django.test import Client, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from pytils.translit import slugify
 
 from .base_tests import BaseTestCase
+from notes.auth import CACHED_BACKEND, MODEL_BACKEND
+from notes.bulk import NoteImporter
 from notes.models import Note
+from notes.querybudget import QueryBudgetExceeded, override_budgets
+from notes.slugs import slug_cache_stats
 from notes.forms import WARNING
 
 
+def query_plan(sql):
+    with connection.cursor() as cursor:
+        cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+        return ' '.join(row[-1] for row in cursor.fetchall())
+
+
 class TestNoteCreation(BaseTestCase):
     """Тесты для создания заметок."""
 
@@ -57,6 +79,90 @@ class TestNoteCreation(BaseTestCase):
         expected_slug = slugify(title)
         self.assertEqual(expected_slug, note.slug)
 
+    def test_same_title_gets_suffix(self):
+        Note.objects.all().delete()
+        form_data = {'title': 'Note', 'text': 'Text', 'slug': ''}
+        for _ in range(3):
+            self.author_client.post(self.url_add, data=form_data)
+        self.assertEqual(
+            set(Note.objects.values_list('slug', flat=True)),
+            {'note', 'note-2', 'note-3'},
+        )
+
+    def test_taken_slugs_read_by_index(self):
+        """Занятые slug с тем же началом ищутся по индексу, без SCAN."""
+        Note.objects.create(title='Note', text='Text', author=self.user)
+        with CaptureQueriesContext(connection) as context:
+            Note.objects.create(title='Note', text='Text', author=self.user)
+        plans = [
+            query_plan(query['sql']) for query in context.captured_queries
+            if query['sql'].startswith('SELECT')
+        ]
+        self.assertEqual(len(plans), 1)
+        self.assertIn('USING COVERING INDEX', plans[0])
+        self.assertNotIn('SCAN', plans[0])
+
+    def test_repeated_title_transliterated_once(self):
+        hits = slug_cache_stats()['hits']
+        Note.objects.create(title='Повтор', text='Text', author=self.user)
+        Note.objects.create(title='Повтор', text='Text', author=self.user)
+        self.assertGreater(slug_cache_stats()['hits'], hits)
+
+    def test_create_note_num_queries(self):
+        """
+        Одна вставка и две точки сохранения.
+
+        Сессия и пользователь после первого запроса берутся из кеша.
+        """
+        form_data = {'title': 'Unique', 'text': 'Text', 'slug': ''}
+        self.author_client.get(self.url_list)
+        with self.assertNumQueries(5):
+            self.author_client.post(self.url_add, data=form_data)
+
+
+class TestConcurrentSlugs(TransactionTestCase):
+    """Одновременное создание заметок в файловой базе SQLite."""
+
+    THREADS = 8
+
+    def setUp(self):
+        self.user = get_user_model().objects.create(username='writer')
+
+    def post_in_threads(self, form_data):
+        def post(_):
+            client = Client()
+            client.force_login(self.user)
+            try:
+                return client.post(reverse('notes:add'), data=form_data)
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(self.THREADS) as pool:
+            return list(pool.map(post, range(self.THREADS)))
+
+    def test_concurrent_creates_get_unique_slugs(self):
+        responses = self.post_in_threads(
+            {'title': 'Same title', 'text': 'Text', 'slug': ''}
+        )
+        self.assertTrue(all(
+            response.status_code == HTTPStatus.FOUND
+            for response in responses
+        ))
+        slugs = list(Note.objects.values_list('slug', flat=True))
+        self.assertEqual(len(slugs), self.THREADS)
+        self.assertEqual(len(set(slugs)), self.THREADS)
+
+    def test_concurrent_explicit_slug_is_form_error(self):
+        responses = self.post_in_threads(
+            {'title': 'Same title', 'text': 'Text', 'slug': 'taken'}
+        )
+        statuses = sorted(response.status_code for response in responses)
+        self.assertEqual(
+            statuses,
+            [HTTPStatus.OK] * (self.THREADS - 1) + [HTTPStatus.FOUND],
+        )
+        self.assertEqual(Note.objects.filter(slug='taken').count(), 1)
+
 
 class TestNoteEditDelete(BaseTestCase):
     """Тесты для редактирования и удаления заметок."""
@@ -96,3 +202,199 @@ class TestNoteEditDelete(BaseTestCase):
         self.assertEqual(updated_note.text, original_note.text)
         self.assertEqual(updated_note.slug, original_note.slug)
         self.assertEqual(updated_note.author, original_note.author)
+
+
+class TestNoteImportExport(BaseTestCase):
+    """Тесты массового импорта и экспорта заметок."""
+
+    @staticmethod
+    def jsonl(*rows):
+        return [
+            row if isinstance(row, str) else json.dumps(row) + '\n'
+            for row in rows
+        ]
+
+    def test_import_reports_row_errors(self):
+        importer = NoteImporter(self.author)
+        errors = list(importer.run(self.jsonl(
+            {'title': 'Импорт', 'text': 'текст', 'slug': 'imported'},
+            {'title': 'Импорт', 'text': 'текст', 'slug': self.note.slug},
+            '{"title": \n',
+            '[]\n',
+            {'title': 'Без текста'},
+            '\n',
+            {'title': 'Test Note', 'text': 'текст'},
+            {'title': 'Test Note', 'text': 'текст'},
+        )))
+        # Занятый slug выясняется только при сохранении пачки.
+        errors = dict(errors)
+        self.assertEqual(sorted(errors), [2, 3, 4, 5])
+        self.assertEqual(errors[2], self.note.slug + WARNING)
+        self.assertEqual(importer.created, 3)
+        self.assertEqual(
+            set(Note.objects.filter(
+                author=self.author, title='Test Note'
+            ).values_list('slug', flat=True)),
+            {'test-note', 'test-note-2'},
+        )
+
+    def test_import_batch_num_queries(self):
+        """Занятые slug, slug с тем же началом и вставка в SAVEPOINT."""
+        rows = self.jsonl(*(
+            {'title': self.note.title, 'text': 'текст'} for _ in range(100)
+        ))
+        Note.objects.create(
+            title=self.note.title, text='текст', author=self.author
+        )
+        importer = NoteImporter(self.author, batch_size=100)
+        with self.assertNumQueries(5):
+            self.assertEqual(list(importer.run(rows)), [])
+        self.assertEqual(
+            Note.objects.filter(slug__startswith='test-note').count(), 101
+        )
+
+    def test_import_reads_taken_slugs_by_index(self):
+        """Занятые slug нескольких основ ищутся по индексу, без SCAN."""
+        Note.objects.create(title='Другая', text='текст', author=self.author)
+        rows = self.jsonl(*(
+            {'title': title, 'text': 'текст'}
+            for title in (self.note.title, 'Другая') for _ in range(2)
+        ))
+        with CaptureQueriesContext(connection) as context:
+            self.assertEqual(list(NoteImporter(self.author).run(rows)), [])
+        plans = [
+            query_plan(query['sql']) for query in context.captured_queries
+            if query['sql'].startswith('SELECT')
+        ]
+        self.assertEqual(len(plans), 2)
+        for plan in plans:
+            self.assertNotIn('SCAN', plan)
+
+    def test_import_command(self):
+        with tempfile.NamedTemporaryFile(
+                'w', suffix='.jsonl', encoding='utf-8') as file:
+            file.writelines(self.jsonl(
+                {'title': 'Из файла', 'text': 'текст'},
+                {'title': 'Из файла', 'text': 'текст', 'slug': 'travel'},
+            ))
+            file.flush()
+            stdout, stderr = StringIO(), StringIO()
+            call_command(
+                'import_notes', self.author.username, file.name,
+                stdout=stdout, stderr=stderr,
+            )
+        self.assertIn('Создано заметок: 1, ошибок: 1', stdout.getvalue())
+        self.assertIn('Строка 2', stderr.getvalue())
+
+    def test_export_streams_own_notes(self):
+        response = self.author_note.get(self.url_export)
+        self.assertTrue(response.streaming)
+        rows = [
+            json.loads(line)
+            for line in b''.join(response.streaming_content).splitlines()
+        ]
+        self.assertEqual(
+            [row['slug'] for row in rows],
+            [self.test_note.slug, self.note3.slug],
+        )
+
+    def test_export_import_roundtrip(self):
+        content = b''.join(
+            self.author_note.get(self.url_export).streaming_content
+        )
+        notes = list(Note.objects.filter(author=self.author).values(
+            'title', 'text', 'slug'
+        ))
+        Note.objects.filter(author=self.author).delete()
+        importer = NoteImporter(self.author)
+        errors = list(importer.run(content.decode().splitlines()))
+        self.assertEqual(errors, [])
+        self.assertEqual(list(Note.objects.filter(author=self.author).values(
+            'title', 'text', 'slug'
+        ).order_by('id')), notes)
+
+
+class TestQueryBudget(BaseTestCase):
+    """Тесты бюджета SQL-запросов."""
+
+    @pytest.mark.query_budget('notes:list', 0)
+    def test_exceeded_budget_fails_test(self):
+        with self.assertRaises(QueryBudgetExceeded):
+            self.author_client.get(self.url_list)
+
+    @override_settings(QUERY_BUDGET_STRICT=False)
+    def test_exceeded_budget_only_logged_outside_tests(self):
+        with override_budgets({'notes:list': 0}), self.assertLogs(
+                'notes.querybudget', 'WARNING') as logs:
+            response = self.author_client.get(self.url_list)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertIn('notes:list', logs.output[0])
+        self.assertGreater(response.wsgi_request.query_count, 0)
+
+
+class TestSqlitePragmas(BaseTestCase):
+
+    def test_pragmas_on_new_connection(self):
+        """Каждое новое соединение с файлом базы получает SQLITE_PRAGMAS."""
+        with tempfile.TemporaryDirectory() as directory:
+            wrapper = DatabaseWrapper({
+                **connection.settings_dict, 'NAME': f'{directory}/db.sqlite3'
+            })
+            try:
+                with wrapper.cursor() as cursor:
+                    values = {}
+                    for name in settings.SQLITE_PRAGMAS:
+                        cursor.execute(f'PRAGMA {name}')
+                        values[name] = cursor.fetchone()[0]
+            finally:
+                wrapper.close()
+        self.assertEqual(values, {
+            'journal_mode': 'wal',
+            'synchronous': 1,
+            'busy_timeout': 5000,
+            'cache_size': -64 * 1024,
+            'mmap_size': 256 * 1024 * 1024,
+        })
+
+
+class TestAuthCache(BaseTestCase):
+    """Сессия и пользователь из кеша."""
+
+    def test_authenticated_page_makes_no_auth_queries(self):
+        self.author_client.get(self.url_list)
+        with CaptureQueriesContext(connection) as context:
+            response = self.author_client.get(self.url_list)
+        self.assertEqual(response.context['user'], self.user)
+        self.assertEqual([
+            query['sql'] for query in context.captured_queries
+            if 'django_session' in query['sql'] or 'auth_user' in query['sql']
+        ], [])
+
+    def test_password_change_ends_cached_sessions(self):
+        # Свой пользователь: общий клиент класса не должен разлогиниться.
+        user = get_user_model().objects.create(username='Меняет пароль')
+        client = Client()
+        client.force_login(user)
+        client.get(self.url_list)
+        user.set_password('новый пароль')
+        user.save()
+        response = client.get(self.url_list)
+        self.assertRedirects(
+            response, f'{self.url_login}?next={self.url_list}'
+        )
+
+    # Первый запрос один раз переписывает сессию сверх бюджета списка.
+    @pytest.mark.query_budget('notes:list', None)
+    def test_model_backend_session_moves_to_cache(self):
+        """Сессии, созданные до CachedModelBackend, переходят на него."""
+        client = Client()
+        client.force_login(self.user, backend=MODEL_BACKEND)
+        response = client.get(self.url_list)
+        self.assertEqual(response.context['user'], self.user)
+        self.assertEqual(client.session[BACKEND_SESSION_KEY], CACHED_BACKEND)
+        with CaptureQueriesContext(connection) as context:
+            client.get(self.url_list)
+        self.assertEqual([
+            query['sql'] for query in context.captured_queries
+            if 'django_session' in query['sql'] or 'auth_user' in query['sql']
+        ], [])
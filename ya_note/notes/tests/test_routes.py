@@ -1,5 +1,6 @@
 from http import HTTPStatus
 
+from django.urls import reverse
 
 from .base_tests import BaseTestCase
 
@@ -26,6 +27,7 @@ class TestRoutes(BaseTestCase):
             self.url_list,
             self.url_done,
             self.url_add,
+            self.url_export,
         )
         for name in urls:
             with self.subTest(name=name):
@@ -54,6 +56,8 @@ class TestRoutes(BaseTestCase):
             (self.url_detail),
             (self.url_list),
             (self.url_done),
+            (self.url_search),
+            (self.url_export),
         )
 
         for name in urls:
@@ -61,3 +65,13 @@ class TestRoutes(BaseTestCase):
                 redirect_url = f'{login_url}?next={name}'
                 response = self.client.get(name)
                 self.assertRedirects(response, redirect_url)
+
+    def test_metrics_only_for_local_clients(self):
+        url = reverse('metrics')
+        for remote_addr, status in (
+            ('127.0.0.1', HTTPStatus.OK),
+            ('10.0.0.1', HTTPStatus.NOT_FOUND),
+        ):
+            with self.subTest(remote_addr=remote_addr):
+                response = self.client.get(url, REMOTE_ADDR=remote_addr)
+                self.assertEqual(response.status_code, status)
@@ -0,0 +1,167 @@
+"""
+Время фаз обработки запроса.
+
+TimingMiddleware заводит на каждый запрос счётчик фаз: разбор URL,
+работа с базой (request.query_duration из querybudget), рендеринг
+шаблонов (бэкенд TimedDjangoTemplates) и проверка форм
+(TimedFormMixin). Фазы уходят в заголовок Server-Timing ответа
+и копятся в процессе; metrics_view отдаёт их в текстовом формате
+Prometheus вместе со статистикой кеша транслитерации из notes.slugs.
+Фазы могут пересекаться: запросы из ленивого QuerySet в шаблоне
+попадают и в db, и в render.
+"""
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.http import Http404, HttpResponse
+from django.template.backends.django import (
+    DjangoTemplates, Template, reraise
+)
+from django.template.exceptions import TemplateDoesNotExist
+
+from .slugs import slug_cache_stats
+
+METRIC = 'yanote_request_phase_seconds'
+SLUG_CACHE_METRIC = 'notes_slug_cache_lookups_total'
+SLUG_HIT_RATE_METRIC = 'notes_slug_cache_hit_ratio'
+PHASES = ('resolve', 'db', 'render', 'form', 'total')
+# Прочие методы идут в метку "other", чтобы число рядов было конечным.
+METHODS = ('GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS')
+
+_current = ContextVar('request_timings', default=None)
+_lock = threading.Lock()
+# (представление, метод, фаза) → [число, сумма секунд]
+_totals = defaultdict(lambda: [0, 0.0])
+
+
+@contextmanager
+def phase(name):
+    """Добавляет время блока к фазе текущего запроса, если он есть."""
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[name] += time.perf_counter() - start
+
+
+def record(view_name, method, timings):
+    if method not in METHODS:
+        method = 'other'
+    with _lock:
+        for name, seconds in timings.items():
+            total = _totals[view_name, method, name]
+            total[0] += 1
+            total[1] += seconds
+
+
+def server_timing(timings):
+    return ', '.join(
+        f'{name};dur={timings[name] * 1e3:.2f}'
+        for name in PHASES if name in timings
+    )
+
+
+class TimingMiddleware:
+    """
+    Меряет фазы запроса; должна стоять первой в MIDDLEWARE.
+
+    Фаза resolve — время от входа в middleware до process_view,
+    то есть разбор URL и лёгкие process_request остальных middleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        start = time.perf_counter()
+        request.timing_start = start
+        timings = defaultdict(float)
+        token = _current.set(timings)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        timings['total'] = time.perf_counter() - start
+        if getattr(request, 'query_duration', None) is not None:
+            timings['db'] = request.query_duration
+        response['Server-Timing'] = server_timing(timings)
+        match = request.resolver_match
+        if match:
+            record(match.view_name, request.method, timings)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        timings = _current.get()
+        if timings is not None:
+            timings['resolve'] = time.perf_counter() - request.timing_start
+
+
+class TimedTemplate(Template):
+
+    def render(self, context=None, request=None):
+        with phase('render'):
+            return super().render(context, request)
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """Шаблонный бэкенд Django, который засекает рендеринг."""
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return TimedTemplate(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            reraise(exc, self)
+
+
+class TimedFormMixin:
+    """Засекает проверку формы как фазу form."""
+
+    def full_clean(self):
+        with phase('form'):
+            super().full_clean()
+
+
+def metrics_text():
+    lines = [
+        f'# HELP {METRIC} Время фаз обработки запроса.',
+        f'# TYPE {METRIC} summary',
+    ]
+    with _lock:
+        totals = sorted(_totals.items())
+    for (view_name, method, name), (count, seconds) in totals:
+        labels = f'view="{view_name}",method="{method}",phase="{name}"'
+        lines.append(f'{METRIC}_count{{{labels}}} {count}')
+        lines.append(f'{METRIC}_sum{{{labels}}} {seconds:.6f}')
+    slugs = slug_cache_stats()
+    lines += [
+        f'# HELP {SLUG_CACHE_METRIC} Попадания и промахи кеша '
+        'транслитерации slug.',
+        f'# TYPE {SLUG_CACHE_METRIC} counter',
+        f'{SLUG_CACHE_METRIC}{{result="hit"}} {slugs["hits"]}',
+        f'{SLUG_CACHE_METRIC}{{result="miss"}} {slugs["misses"]}',
+        f'# HELP {SLUG_HIT_RATE_METRIC} Доля попаданий кеша '
+        'транслитерации slug.',
+        f'# TYPE {SLUG_HIT_RATE_METRIC} gauge',
+        f'{SLUG_HIT_RATE_METRIC} {slugs["hit_rate"]:.6f}',
+    ]
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view(request):
+    """Метрики для Prometheus; доступны только с METRICS_ALLOWED_IPS."""
+    if request.META.get('REMOTE_ADDR') not in settings.METRICS_ALLOWED_IPS:
+        raise Http404
+    return HttpResponse(
+        metrics_text(), content_type='text/plain; version=0.0.4'
+    )
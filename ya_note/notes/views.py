@@ -1,9 +1,15 @@
+from django.conf import settings
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.db import IntegrityError, transaction
+from django.http import StreamingHttpResponse
 from django.urls import reverse_lazy
 from django.views import generic
 
+from .bulk import export_lines
 from .forms import NoteForm
 from .models import Note
+from .pagination import get_notes_page
+from .search import search_notes
 
 
 class Home(generic.TemplateView):
@@ -26,22 +32,35 @@ class NoteBase(LoginRequiredMixin):
         return self.model.objects.filter(author=self.request.user)
 
 
-class NoteCreate(NoteBase, generic.CreateView):
-    """Добавление заметки."""
+class NoteFormBase(NoteBase):
+    """Базовый класс для создания и редактирования заметки."""
     template_name = 'notes/form.html'
     form_class = NoteForm
 
     def form_valid(self, form):
-        new_note = form.save(commit=False)
-        new_note.author = self.request.user
-        new_note.save()
+        """Занятый slug превращается в ошибку формы, а не в 500."""
+        try:
+            with transaction.atomic():
+                return super().form_valid(form)
+        except IntegrityError:
+            if not Note.objects.filter(
+                    slug=form.cleaned_data['slug']
+            ).exclude(pk=form.instance.pk).exists():
+                raise
+        form.add_slug_conflict_error()
+        return self.form_invalid(form)
+
+
+class NoteCreate(NoteFormBase, generic.CreateView):
+    """Добавление заметки."""
+
+    def form_valid(self, form):
+        form.instance.author = self.request.user
         return super().form_valid(form)
 
 
-class NoteUpdate(NoteBase, generic.UpdateView):
+class NoteUpdate(NoteFormBase, generic.UpdateView):
     """Редактирование заметки."""
-    template_name = 'notes/form.html'
-    form_class = NoteForm
 
 
 class NoteDelete(NoteBase, generic.DeleteView):
@@ -50,10 +69,58 @@ class NoteDelete(NoteBase, generic.DeleteView):
 
 
 class NotesList(NoteBase, generic.ListView):
-    """Список всех заметок пользователя."""
+    """Список всех заметок пользователя, страницы по курсору after."""
     template_name = 'notes/list.html'
 
+    def get_queryset(self):
+        """
+        Для списка нужны только id, slug и заголовок.
+
+        Порядок по id совпадает с индексом (author, id),
+        поэтому страница читается из индекса без сортировки.
+        """
+        return super().get_queryset().only(
+            'id', 'slug', 'title'
+        ).order_by('id')
+
+    def get_context_data(self, **kwargs):
+        notes, next_cursor = get_notes_page(
+            self.object_list, self.request.GET.get('after')
+        )
+        kwargs['next_cursor'] = next_cursor
+        return super().get_context_data(object_list=notes, **kwargs)
+
 
 class NoteDetail(NoteBase, generic.DetailView):
     """Заметка подробно."""
     template_name = 'notes/detail.html'
+
+
+class NoteSearch(NoteBase, generic.TemplateView):
+    """Полнотекстовый поиск по заметкам пользователя."""
+    template_name = 'notes/search.html'
+
+    def get_context_data(self, **kwargs):
+        query = self.request.GET.get('q', '').strip()
+        kwargs['query'] = query
+        kwargs['results'] = search_notes(
+            self.request.user, query, settings.NOTES_COUNT_ON_PAGE
+        )
+        return super().get_context_data(**kwargs)
+
+
+class NoteExport(NoteBase, generic.View):
+    """
+    Выгрузка заметок пользователя в JSON Lines.
+
+    Ответ отдаётся потоком, а заметки читаются из базы порциями,
+    поэтому память не растёт с числом заметок.
+    """
+
+    def get(self, request, *args, **kwargs):
+        response = StreamingHttpResponse(
+            export_lines(self.get_queryset()),
+            content_type='application/x-ndjson; charset=utf-8',
+        )
+        response['Content-Disposition'] = 'attachment; filename="notes.jsonl"'
+        return response
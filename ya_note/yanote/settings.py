@@ -22,10 +22,13 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'notes.timing.TimingMiddleware',
+    'notes.querybudget.QueryBudgetMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
+    'notes.auth.SessionBackendMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
@@ -35,7 +38,7 @@ ROOT_URLCONF = 'yanote.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'notes.timing.TimedDjangoTemplates',
         'DIRS': [BASE_DIR / 'templates'],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -56,9 +59,36 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Соединение живёт между запросами, PRAGMA ставятся один раз.
+        'CONN_MAX_AGE': 60,
+        # Тестовая база в файле, а не в памяти, чтобы тесты
+        # с потоками работали с настоящими блокировками SQLite.
+        'TEST': {
+            'NAME': BASE_DIR / 'test_db.sqlite3',
+        },
     }
 }
 
+# PRAGMA для каждого нового соединения с SQLite, см. notes/sqlite.py.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+    # Сколько миллисекунд ждать чужую запись вместо «database is locked».
+    'busy_timeout': 5000,
+    # Отрицательный cache_size — в КиБ: 64 МиБ страниц на соединение.
+    'cache_size': -64 * 1024,
+    'mmap_size': 256 * 1024 * 1024,
+}
+
+
+# Сессия читается из кеша, а пишется и в кеш, и в базу.
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+
+# Пользователь сессии тоже берётся из кеша, см. notes/auth.py.
+# Сессии с путём ModelBackend переводит SessionBackendMiddleware.
+AUTHENTICATION_BACKENDS = ['notes.auth.CachedModelBackend']
+
+USER_CACHE_TIMEOUT = 60 * 60
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -87,3 +117,33 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 LOGIN_URL = reverse_lazy('users:login')
 LOGIN_REDIRECT_URL = reverse_lazy('notes:home')
+
+NOTES_COUNT_ON_PAGE = 50
+
+# Сколько заголовков помнит кеш транслитерации slug.
+SLUG_CACHE_SIZE = 4096
+
+# Заметок в одном bulk_create при импорте JSON Lines.
+NOTES_IMPORT_BATCH_SIZE = 500
+
+# Сколько заметок экспорт читает из базы за раз.
+NOTES_EXPORT_CHUNK_SIZE = 2000
+
+# Предел SQL-запросов на запрос к представлению, см. notes/querybudget.py.
+# Превышение пишется в лог, а при QUERY_BUDGET_STRICT поднимает ошибку.
+QUERY_BUDGETS = {
+    'notes:home': 0,
+    'notes:list': 3,
+    'notes:detail': 3,
+    'notes:add': 12,
+    'notes:edit': 6,
+    'notes:delete': 4,
+    'notes:search': 4,
+    'notes:export': 2,
+    'notes:success': 2,
+}
+
+QUERY_BUDGET_STRICT = False
+
+# Адреса, которым открыт /metrics/ с временем фаз запросов.
+METRICS_ALLOWED_IPS = ('127.0.0.1', '::1')